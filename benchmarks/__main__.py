@@ -0,0 +1,84 @@
+import json
+import sys
+import tempfile
+
+import click
+
+from .run import compare, load_report, run_benchmarks
+from .wiki import generate_wiki
+
+
+def wiki_options(function):
+    for option in reversed([
+        click.option('--files', default=1000, show_default=True, help='Number of wiki files.'),
+        click.option('--links', default=5.0, show_default=True, help='Mean number of links per file.'),
+        click.option('--tags', default=0.3, show_default=True, help='Fraction of files with tags.'),
+        click.option('--depth', default=3, show_default=True, help='Depth of the directory tree.'),
+        click.option('--relative', default=0.3, show_default=True,
+                     help='Fraction of links to other directories, e.g. [[../d1/page7]].'),
+        click.option('--seed', default=0, show_default=True, help='Seed of the generator.'),
+    ]):
+        function = option(function)
+    return function
+
+
+@click.group()
+def cli():
+    """Benchmarks of VimWikiGraph on synthetic wikis."""
+
+
+@cli.command()
+@click.argument('root', type=click.Path(file_okay=False))
+@wiki_options
+def generate(root, files, links, tags, depth, relative, seed):
+    """Generate a synthetic wiki in ROOT."""
+    paths = generate_wiki(root, files, links, tags, depth, relative, seed=seed)
+    click.echo(f'Generated {len(paths)} files in {root}')
+
+
+@cli.command()
+@wiki_options
+@click.option('--backend', type=click.Choice(['networkx', 'csr']), default='networkx', show_default=True)
+@click.option('--repeat', default=3, show_default=True, help='Runs of each stage.')
+@click.option('--stage', 'stages', multiple=True, help='Only run these stages.')
+@click.option('-k', 'k', type=int, default=None, help='Pivots of the approximate betweenness. Exact if omitted.')
+@click.option('--output', '-o', type=click.Path(dir_okay=False), help='Write the JSON report to this file.')
+def run(files, links, tags, depth, relative, seed, backend, repeat, stages, k, output):
+    """Time every stage on a generated wiki and write a JSON report."""
+    with tempfile.TemporaryDirectory(prefix='vimwikigraph-wiki-') as root:
+        paths = generate_wiki(root, files, links, tags, depth, relative, seed=seed)
+        report = run_benchmarks(root, paths, backend, repeat, list(stages) or None, k, log=click.echo)
+    report['wiki'] = {'files': files, 'links': links, 'tags': tags, 'depth': depth, 'relative': relative,
+                      'seed': seed}
+    if output:
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        click.echo(f'Wrote {output}')
+
+
+@cli.command('compare')
+@click.argument('old', type=click.Path(exists=True, dir_okay=False))
+@click.argument('new', type=click.Path(exists=True, dir_okay=False))
+@click.option('--threshold', default=0.1, show_default=True, help='Relative slowdown that counts as a regression.')
+def compare_reports(old, new, threshold):
+    """Compare two reports. Exits with status 1 if a stage of NEW is slower or needs more memory than in OLD."""
+    old, new = load_report(old), load_report(new)
+    if old.get('wiki') != new.get('wiki') or old.get('backend') != new.get('backend'):
+        click.echo('Warning: the reports were made with different wikis or backends', err=True)
+    rows = compare(old, new, threshold)
+    regressions = 0
+    for name, before, after, ratio, peak_before, peak_after, memory_ratio, regressed in rows:
+        regressions += regressed
+        if after is None:
+            click.echo(f"{name:<24} {before * 1000:10.1f} ms     failed  REGRESSION")
+            continue
+        memory = ''
+        if memory_ratio is not None:
+            memory = f" {peak_before / 2 ** 20:10.1f} MB {peak_after / 2 ** 20:10.1f} MB {memory_ratio:6.2f}x"
+        click.echo(f"{name:<24} {before * 1000:10.1f} ms {after * 1000:10.1f} ms {ratio:6.2f}x{memory}"
+                   f"{'  REGRESSION' if regressed else ''}")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    cli()
@@ -0,0 +1,282 @@
+import datetime
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from urllib.parse import quote
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+from .wiki import TAGS, touch_wiki
+
+
+REPORT_VERSION = 2
+
+logger = logging.getLogger(__name__)
+
+
+def reset_peak_rss() -> bool:
+    """
+    Resets the peak resident set size of the process to its current size. Only Linux supports this, by writing 5 to
+    /proc/self/clear_refs. Returns whether the peak was reset.
+    """
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss() -> int:
+    """
+    Returns the peak resident set size of the process in bytes since the last reset_peak_rss, or None if it cannot be
+    determined.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def measure(function, repeat: int = 3, setup=None) -> dict:
+    """
+    Calls function repeat times and returns the minimum and median wall time in seconds, all run times and the peak
+    memory of the stage in bytes. setup is called before every run and is neither timed nor measured.
+
+    Where the peak RSS can be reset, 'peak_rss' is the largest peak RSS of the process during a run. Elsewhere
+    function is called once more under tracemalloc, which is too slow to time, and 'peak_allocated' is the peak of the
+    memory allocated by Python during that run.
+    """
+    times = list()
+    peaks = list()
+    for _ in range(repeat):
+        if setup:
+            setup()
+        reset = reset_peak_rss()
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+        if reset:
+            peaks.append(peak_rss())
+    result = {
+        'seconds': min(times),
+        'median': statistics.median(times),
+        'runs': times,
+    }
+    if peaks:
+        result['peak_rss'] = max(peaks)
+    else:
+        if setup:
+            setup()
+        tracemalloc.start()
+        try:
+            function()
+            result['peak_allocated'] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True, check=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except Exception:
+        return None
+
+
+def write_config(path: str, backend: str):
+    """
+    Writes a config file for the Flask app with all form defaults disabled.
+    """
+    with open(path, 'w') as f:
+        f.write("DEFAULT_FILTER = ['']\n")
+        f.write("DEFAULT_FILE_FILTER = ['']\n")
+        f.write("DEFAULT_HIGHLIGHT = ['']\n")
+        f.write("DEFAULT_COLLAPSE = ['']\n")
+        f.write(f"GRAPH_BACKEND = {backend!r}\n")
+
+
+def run_benchmarks(root: str, paths: list, backend: str = 'networkx', repeat: int = 3, stages: list = None,
+                   k: int = None, log=print) -> dict:
+    """
+    Times every stage of building, querying and serving the graph of a wiki.
+
+    Args:
+        root (str): Root directory of the wiki.
+        paths (list): Files of the wiki. Some of them are changed to time reloads.
+        backend (str): 'networkx' or 'csr'.
+        repeat (int): Number of runs of each stage. The report keeps the fastest and the median run.
+        stages (list): Names of the stages to run. All if None.
+        k (int): Number of pivots of the betweenness centrality of weight_attribute. Exact if None.
+        log: Called with a line for every finished stage.
+
+    Returns:
+        dict: The report with the results of every stage by name.
+    """
+    work = tempfile.mkdtemp(prefix='vimwikigraph-benchmark-')
+    config = os.path.join(work, 'vimwikigraph.cfg')
+    write_config(config, backend)
+    # The app reads its config on import.
+    os.environ['VIMWIKIGRAPH_CONFIG'] = config
+    os.environ['VIMWIKIDIR'] = root
+    from vimwikigraph.app import State, app
+    from vimwikigraph.centrality import clear_cache
+    from vimwikigraph.search import SearchIndex
+    from vimwikigraph.vimwikigraph import VimwikiGraph
+    app.config.from_pyfile(config)
+
+    results = dict()
+
+    def stage(name, function, setup=None, times=repeat):
+        if stages is not None and name not in stages:
+            return
+        try:
+            results[name] = measure(function, times, setup)
+        except Exception as e:
+            logger.exception(f"Stage {name} failed")
+            results[name] = {'failed': True, 'error': str(e)}
+            log(f"{name:<24}     failed")
+            return
+        peak = results[name].get('peak_rss', results[name].get('peak_allocated'))
+        memory = f" {peak / 2 ** 20:10.1f} MB" if peak is not None else ''
+        log(f"{name:<24} {results[name]['seconds'] * 1000:10.1f} ms{memory}")
+
+    graph = None
+
+    def build():
+        nonlocal graph
+        graph = VimwikiGraph(root, backend=backend)
+    stage('build', build)
+    if graph is None:
+        build()
+    # The files with the most links are the roots of the collapse and neighborhood stages.
+    nodes = sorted(paths, key=graph.original_graph.out_degree, reverse=True)
+    hub = nodes[0]
+    seed = iter(range(1_000_000))
+
+    stage('reload_unchanged', graph.reload_graph)
+    stage('reload_changed', graph.reload_graph, setup=lambda: touch_wiki(paths, 0.01, next(seed)))
+    stage('reset_graph', graph.reset_graph, setup=graph.reset_graph)
+    stage('filter_filenames', lambda: graph.filter_filenames(['page1']), setup=graph.reset_graph)
+    stage('filter_nodes', lambda: graph.filter_nodes(['important']), setup=graph.reset_graph)
+    stage('filter_nodes_invert', lambda: graph.filter_nodes(['important'], invert=True), setup=graph.reset_graph)
+    stage('filter_tags', lambda: graph.filter_tags([TAGS[0]]), setup=graph.reset_graph)
+    stage('collapse_children', lambda: graph.collapse_children(nodes[:10]), setup=graph.reset_graph)
+    stage('weight_attribute', lambda: graph.weight_attribute(k=k), setup=lambda: (graph.reset_graph(), clear_cache()))
+    stage('remove_nonadjacent_nodes', lambda: graph.remove_nonadjacent_nodes(hub, 2), setup=graph.reset_graph)
+    stage('search_index', lambda: SearchIndex(graph.lines), times=1)
+    # The search stages time queries, not the index built on first use.
+    graph.search_index
+    stage('search', lambda: graph.search('important todo'))
+    stage('search_phrase', lambda: graph.search('"vim graph"'))
+    stage('search_prefix', lambda: graph.search('proj*', boost=0.5))
+    graph.reset_graph()
+    output = os.path.join(work, 'graph')
+    stage('write', lambda: graph.write(output, 'gml'), times=1)
+    stage('write_dot', lambda: graph.write(output, 'dot'), times=1)
+    stage('write_graphml', lambda: graph.write(output, 'graphml'), times=1)
+    stage('write_json', lambda: graph.write(output, 'json'), times=1)
+    stage('write_pyviz', lambda: graph.write_pyviz(output), times=1)
+
+    State.instance = None
+    state = State.get_instance()
+    state.get_graph().search_index
+    client = app.test_client()
+
+    def get(url):
+        response = client.get(url)
+        if response.status_code != 200:
+            raise RuntimeError(f"GET {url} returned {response.status_code}")
+        return response.get_data()
+
+    def clear_caches():
+        state.network_cache.clear()
+        state.stream_cache.clear()
+
+    stage('route_network_cold', lambda: get('/network'), setup=clear_caches)
+    stage('route_network_cached', lambda: get('/network'))
+    stage('route_network_stream', lambda: get('/network/stream'), setup=clear_caches)
+    stage('route_neighborhood', lambda: get(f'/neighborhood?node={quote(hub)}&depth=2'), setup=clear_caches)
+    stage('route_node', lambda: client.post('/node', json={'node': hub}).get_data())
+    stage('route_tags', lambda: get('/tags'))
+    stage('route_search', lambda: get('/search?q=important+todo'))
+
+    shutil.rmtree(work, ignore_errors=True)
+    return {
+        'version': REPORT_VERSION,
+        'commit': git_commit(),
+        'date': datetime.datetime.now().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'backend': backend,
+        'files': len(paths),
+        'nodes': graph.original_graph.number_of_nodes(),
+        'edges': graph.original_graph.number_of_edges(),
+        'stages': results,
+    }
+
+
+def compare(old: dict, new: dict, threshold: float = 0.1, noise: float = 0.001, memory_noise: int = 1 << 20) -> list:
+    """
+    Compares the fastest runs and the peak memory of the stages of two reports.
+
+    Args:
+        old (dict): Report of the baseline.
+        new (dict): Report to check.
+        threshold (float): Relative slowdown or memory growth above which a stage counts as a regression.
+        noise (float): Absolute slowdown in seconds below which a stage never counts as a regression.
+        memory_noise (int): Absolute memory growth in bytes below which a stage never counts as a regression.
+
+    Returns:
+        list: (stage, old seconds, new seconds, ratio, old peak bytes, new peak bytes, memory ratio, regressed) for
+        every stage of the baseline that was run again. Peaks are None unless both reports measured them the same
+        way. A stage that failed in the new report has None as new seconds and counts as a regression.
+    """
+    rows = list()
+    for name, result in new['stages'].items():
+        baseline = old['stages'].get(name)
+        if not baseline or 'seconds' not in baseline:
+            continue
+        before = baseline['seconds']
+        if 'seconds' not in result:
+            rows.append((name, before, None, None, None, None, None, True))
+            continue
+        after = result['seconds']
+        ratio = after / before if before else float('inf')
+        regressed = ratio > 1 + threshold and after - before > noise
+        peak_before = peak_after = memory_ratio = None
+        for key in ('peak_rss', 'peak_allocated'):
+            if baseline.get(key) and result.get(key) is not None:
+                peak_before, peak_after = baseline[key], result[key]
+                memory_ratio = peak_after / peak_before
+                regressed |= memory_ratio > 1 + threshold and peak_after - peak_before > memory_noise
+                break
+        rows.append((name, before, after, ratio, peak_before, peak_after, memory_ratio, regressed))
+    return rows
+
+
+def load_report(path: str) -> dict:
+    with open(path) as f:
+        report = json.load(f)
+    if report.get('version') != REPORT_VERSION:
+        raise ValueError(f"Invalid report version {report.get('version')}, expected {REPORT_VERSION}")
+    return report
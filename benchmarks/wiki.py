@@ -0,0 +1,98 @@
+import itertools
+import os
+import random
+
+
+VOCABULARY = ['vim', 'graph', 'note', 'idea', 'project', 'meeting', 'python', 'link', 'wiki', 'draft', 'review',
+              'important', 'todo', 'done', 'alpha', 'beta', 'gamma', 'delta', 'server', 'client', 'network', 'filter']
+TAGS = ['todo', 'important', 'work', 'home', 'idea', 'reading', 'private', 'project', 'journal', 'archive']
+
+
+def generate_wiki(root: str, files: int = 1000, links: float = 5.0, tags: float = 0.3, depth: int = 3,
+                  relative: float = 0.3, external: float = 0.05, words: int = 200, branching: int = 3,
+                  seed: int = 0) -> list:
+    """
+    Writes a synthetic VimWiki tree. Files are spread over a directory tree and link mostly to files in their own
+    directory, the rest of their links are relative links to other directories such as [[../d1/page7]], links with
+    anchors and descriptions or links to websites. Word and link target frequencies are skewed like in real wikis.
+
+    Args:
+        root (str): Directory to write to. It is created if missing.
+        files (int): Number of wiki files besides index.wiki.
+        links (float): Mean number of links per file.
+        tags (float): Fraction of files with a tag line such as :todo:work:.
+        depth (int): Depth of the directory tree.
+        relative (float): Fraction of links to files in other directories.
+        external (float): Fraction of links to websites.
+        words (int): Mean number of words per file.
+        branching (int): Number of subdirectories per directory.
+        seed (int): Seed of the generator. The same arguments always generate the same wiki.
+
+    Returns:
+        list: The paths of the generated files.
+    """
+    rng = random.Random(seed)
+    directories = ['']
+    level = ['']
+    for _ in range(depth):
+        level = [os.path.join(parent, f'd{i}') for parent in level for i in range(branching)]
+        directories.extend(level)
+    pages = [os.path.join(rng.choice(directories), f'page{i}') for i in range(files)]
+    by_directory = dict()
+    for page in pages:
+        by_directory.setdefault(os.path.dirname(page), []).append(page)
+    # Zipf distributed targets make a few pages hubs, like the index pages of a real wiki.
+    popularity = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(pages))))
+    word_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(VOCABULARY))))
+
+    def target(page):
+        neighbors = by_directory.get(os.path.dirname(page), ())
+        if rng.random() < relative or len(neighbors) < 2:
+            other = rng.choices(pages, cum_weights=popularity)[0]
+        else:
+            other = rng.choice(neighbors)
+        return os.path.relpath(other, os.path.dirname(page) or '.')
+
+    def link(page):
+        if rng.random() < external:
+            return f'[[https://example{rng.randrange(20)}.com/{rng.choice(VOCABULARY)}|{rng.choice(VOCABULARY)}]]'
+        kind = rng.random()
+        if kind < 0.1:
+            return f'[[{target(page)}#{rng.choice(VOCABULARY)}]]'
+        if kind < 0.3:
+            return f'[[{target(page)}|{rng.choice(VOCABULARY)} {rng.choice(VOCABULARY)}]]'
+        return f'[[{target(page)}]]'
+
+    paths = list()
+    for page in pages + ['index']:
+        lines = [f'= {os.path.basename(page)} =']
+        if rng.random() < tags:
+            lines.append(':' + ':'.join(rng.sample(TAGS, rng.randint(1, 3))) + ':')
+        n_links = len(pages) // 10 if page == 'index' else int(rng.expovariate(1 / links) + 0.5) if links else 0
+        n_words = int(rng.expovariate(1 / words)) + 1
+        tokens = rng.choices(VOCABULARY, cum_weights=word_weights, k=n_words) + [link(page) for _ in range(n_links)]
+        rng.shuffle(tokens)
+        for start in range(0, len(tokens), 12):
+            lines.append(' '.join(tokens[start:start + 12]))
+        path = os.path.join(root, page + '.wiki')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+        paths.append(path)
+    return paths
+
+
+def touch_wiki(paths: list, fraction: float = 0.01, seed: int = 0) -> list:
+    """
+    Appends a word and a link to a random fraction of the files, like a user editing the wiki between reloads.
+
+    Returns:
+        list: The changed files.
+    """
+    rng = random.Random(seed)
+    changed = rng.sample(paths, max(1, int(len(paths) * fraction)))
+    for path in changed:
+        other = rng.choice(paths)
+        with open(path, 'a') as f:
+            f.write(f'{rng.choice(VOCABULARY)} [[{os.path.relpath(other[:-5], os.path.dirname(path))}]]\n')
+    return changed
@@ -3,7 +3,7 @@ from setuptools import find_packages, setup
 setup(
     name='vimwikigraph',
     version='0.1.0',
-    packages=find_packages(),
+    packages=find_packages(exclude=['benchmarks']),
     include_package_data=True,
     install_requires=[
         'flask',
@@ -12,4 +12,9 @@ setup(
         'numpy',
         'pyvis'
     ],
+    extras_require={
+        'watch': ['inotify_simple'],
+        'brotli': ['brotli'],
+        'msgpack': ['msgpack'],
+    },
 )
@@ -0,0 +1,23 @@
+import os
+
+import pytest
+
+# Importing the package creates the Flask app, which loads this config.
+os.environ.setdefault('VIMWIKIGRAPH_CONFIG', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'vimwikigraph.cfg'))
+
+
+@pytest.fixture
+def wiki(tmp_path):
+    """
+    Returns a function that writes a page with the given text into a temporary wiki and returns its path.
+    """
+    def write(name: str, text: str = '') -> str:
+        path = tmp_path / f'{name}.wiki'
+        path.write_text(text)
+        # Reloads only notice changes of the mtime or size.
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+        return str(path)
+
+    write.root = str(tmp_path)
+    return write
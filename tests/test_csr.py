@@ -0,0 +1,21 @@
+from vimwikigraph.csr import CSRGraph
+
+
+def adjacency(graph: CSRGraph) -> dict:
+    return {node: (graph.nodes[node], sorted(graph.successors(node)), sorted(graph.predecessors(node)),
+                   {v: graph.get_edge_data(node, v) for v in graph.successors(node)}) for node in graph}
+
+
+def test_patch_matches_rebuild():
+    graph = CSRGraph('g', ['a', 'b', 'c', 'd'], {'label': ['A', 'B', 'C', 'D']},
+                     [('a', 'b'), ('a', 'c'), ('b', 'c'), ('c', 'd'), ('d', 'a'), ('d', 'b')],
+                     {'anchor': {('a', 'c'): 'x', ('d', 'b'): 'y'}})
+
+    patched = graph.patch({'e': {'label': 'E'}}, {'b'}, [('a', 'e'), ('e', 'f')], [('c', 'd')], {'d': ('label',)},
+                          {('a', 'e'): {'anchor': 'z'}, ('a', 'c'): {}})
+
+    rebuilt = CSRGraph('g', ['a', 'c', 'd', 'e'], {'label': ['A', 'C', None, 'E']},
+                       [('a', 'c'), ('a', 'e'), ('d', 'a'), ('e', 'f')], {'anchor': {('a', 'e'): 'z'}})
+    assert adjacency(patched) == adjacency(rebuilt)
+    assert patched.number_of_edges() == 4
+    assert adjacency(graph)['b'][1] == ['c']
@@ -0,0 +1,53 @@
+import os
+
+from vimwikigraph.vimwikigraph import VimwikiGraph
+
+
+def test_reload_copies_only_touched_nodes(wiki):
+    a = wiki('a', '[[b]]')
+    b = wiki('b', '[[c]]')
+    c = wiki('c', '[[a]]')
+    wiki('d', '[[a]] [[c]]')
+    vimwikigraph = VimwikiGraph(wiki.root)
+    previous = vimwikigraph.original_graph
+
+    wiki('a', '[[b]] [[c]]')
+    vimwikigraph.reload_graph([a])
+    graph = vimwikigraph.original_graph
+
+    assert graph is not previous
+    assert set(graph.successors(a)) == {b, c}
+    assert set(previous.successors(a)) == {b}
+    for node in previous:
+        touched = node in (a, c)
+        assert (graph._succ[node] is previous._succ[node]) != touched, node
+        assert (graph._pred[node] is previous._pred[node]) != touched, node
+        assert (graph._node[node] is previous._node[node]) != touched, node
+
+
+def test_weight_attribute_after_reload_removed_hidden_node(wiki, capsys):
+    a = wiki('a', '[[b]]')
+    b = wiki('b', '[[a]]')
+    orphan = wiki('orphan')
+    vimwikigraph = VimwikiGraph(wiki.root, backend='csr')
+    vimwikigraph.filter_filenames(['orphan'], invert=True)
+
+    os.remove(orphan)
+    vimwikigraph.reload_graph()
+    vimwikigraph.weight_attribute(metric='degree')
+
+    assert capsys.readouterr().out == ''
+    assert sorted(vimwikigraph.view.adjacency()[0]) == [a, b]
+    assert vimwikigraph.view.get_node_attribute(a, 'fontsize') == 100
+
+
+def test_layout_moves_pages_changed_since_the_cached_positions(wiki, tmp_path):
+    pages = [wiki(name, f'[[{target}]]') for name, target in zip('abcde', 'bcdea')]
+    cache_path = str(tmp_path / 'cache.sqlite')
+    previous = VimwikiGraph(wiki.root, cache_path=cache_path, layout=True).snapshot.positions
+
+    wiki('a', '[[c]] [[d]]')
+    positions = VimwikiGraph(wiki.root, cache_path=cache_path, layout=True).snapshot.positions
+
+    assert positions[pages[0]] != previous[pages[0]]
+    assert all(positions[page] == previous[page] for page in pages[1:])
@@ -1,2 +1,5 @@
 #!/bin/sh
+if [ "$1" = "--warm-cache" ]; then
+    flask --app vimwikigraph warm-cache || exit 1
+fi
 flask --app vimwikigraph run
@@ -1,31 +1,96 @@
+import cProfile
+import hashlib
+import io
 import json
+import marshal
 import os
+import pstats
 import re
-from flask import Flask, render_template, request
-from flask_visjs import VisJS4, Network
+import threading
+import time
+import uuid
+import click
+from flask import Flask, Response, g, make_response, render_template, request, send_file, url_for
+from flask_visjs import VisJS4
 
+from .export import FORMATS, GRAPHVIZ_FORMATS, ExportCache, ExportJob, check_format, export
+from .highlight import highlight_spans, render, render_snippets
+from .lru import LRUCache
+from .metrics import metrics
+from .patterns import InvalidPatternError, compile_pattern
+from .query import GraphQuery
+from .search import SearchQuery
+from .stream import NetworkStream, accepted_encoding, compress
 from .vimwikigraph import VimwikiGraph
-from .vimwikitags import VimwikiTags
+from .watcher import VimwikiWatcher
 
 
 app = Flask(__name__)
 app.config.from_envvar('VIMWIKIGRAPH_CONFIG')
 VisJS4().init_app(app)
+metrics.enabled = app.config.get('METRICS', False)
+
+
+def open_vimwikigraph(vimwikigraphdir: str, cache_path: str) -> VimwikiGraph:
+    """
+    Returns the VimwikiGraph of a wiki with the ingest, backend and layout settings of the config.
+    """
+    return VimwikiGraph(
+        vimwikigraphdir,
+        cache_path=cache_path,
+        workers=app.config.get('INGEST_WORKERS', 1),
+        executor=app.config.get('INGEST_EXECUTOR', 'thread'),
+        backend=app.config.get('GRAPH_BACKEND', 'networkx'),
+        layout=app.config.get('LAYOUT', False),
+    )
 
 
 class State:
     instance = None
+    instance_lock = threading.Lock()
 
     def __init__(self):
         self.vimwikigraphdir = os.environ.get('VIMWIKIDIR', '')
         if not self.vimwikigraphdir:
             raise ValueError('VIMWIKIDIR environment variable is not set')
-        self.vimwikigraph = VimwikiGraph(self.vimwikigraphdir)
-        self.vimwikitags = VimwikiTags(self.vimwikigraphdir)
+        self.vimwikigraph = open_vimwikigraph(self.vimwikigraphdir, app.config.get('CACHE_PATH', ''))
+        if app.config.get('SEARCH_INDEX_ON_START', False):
+            self.vimwikigraph.search_index
         self.reset_form()
         self.exclude_tags = app.config.get('EXCLUDE_TAGS', [])
         self.n_tags = app.config.get('N_TAGS', 30)
         self.SEP = app.config.get('SEPARATOR', ';')
+        # Serializes reloads. Graph and tag requests run lock-free against vimwikigraph.snapshot.
+        self.lock = threading.RLock()
+        # Serialized /network responses keyed by (normalized query, snapshot version).
+        self.network_cache = LRUCache(
+            max_entries=app.config.get('NETWORK_CACHE_SIZE', 32),
+            max_size=app.config.get('NETWORK_CACHE_BYTES', 64 * 1024 * 1024),
+            sizeof=lambda entry: len(entry[1]),
+        )
+        # Serializers of recent queries for paginated and streamed networks.
+        self.stream_cache = LRUCache(max_entries=app.config.get('NETWORK_STREAM_CACHE_SIZE', 8))
+        # Highlight spans keyed by (node, highlights, snapshot version).
+        self.highlight_cache = LRUCache(max_entries=app.config.get('HIGHLIGHT_CACHE_SIZE', 1024))
+        metrics.add_cache('network', self.network_cache)
+        metrics.add_cache('network_stream', self.stream_cache)
+        metrics.add_cache('highlight', self.highlight_cache)
+        # Profiles of recent requests by id.
+        self.profiles = LRUCache(max_entries=app.config.get('PROFILE_CACHE_SIZE', 8))
+        # Finished exports on disk and recent export jobs by id.
+        self.exports = ExportCache(app.config.get('EXPORT_PATH', ''), app.config.get('EXPORT_CACHE_SIZE', 16))
+        self.export_jobs = LRUCache(max_entries=app.config.get('EXPORT_JOBS', 32))
+        self.export_lock = threading.Lock()
+        self.watcher = None
+        if app.config.get('WATCH', False):
+            self.watcher = VimwikiWatcher(
+                self.vimwikigraphdir,
+                self.apply_changes,
+                interval=app.config.get('WATCH_INTERVAL', 2.0),
+                debounce=app.config.get('WATCH_DEBOUNCE', 0.5),
+                max_delay=app.config.get('WATCH_MAX_DELAY', 5.0),
+            )
+            self.watcher.start()
 
     def reset_form(self):
         self.filter = app.config.get('DEFAULT_FILTER', [])
@@ -38,9 +103,15 @@ class State:
     @staticmethod
     def get_instance():
         if State.instance is None:
-            State.instance = State()
+            with State.instance_lock:
+                if State.instance is None:
+                    State.instance = State()
         return State.instance
 
+    def apply_changes(self, paths: list):
+        with self.lock:
+            self.vimwikigraph.reload_graph(paths)
+
     def set_form(self, filter, invert_filter, filename_filter, invert_file_filter, highlight, collapse):
         self.filter = filter.split(self.SEP)
         self.invert_filter = invert_filter
@@ -52,6 +123,115 @@ class State:
     def get_graph(self):
         return self.vimwikigraph
 
+    def query(self, tags: list = None, search: dict = None) -> GraphQuery:
+        """
+        Returns the filter, collapse and highlight pipeline of the current form values.
+
+        Args:
+            tags (list): Only keep the nodes that have all of these tags.
+            search (dict): Arguments of filter_search. Only keep the best matches of a full-text query and their
+                neighborhoods.
+        """
+        query = GraphQuery()
+        if self.filename_filter != ['']:
+            query = query.filter_filenames(self.filename_filter, invert=self.invert_filename_filter)
+        if self.filter != ['']:
+            query = query.filter_nodes(self.filter, invert=self.invert_filter)
+        if tags:
+            query = query.filter_tags(tags)
+        if search:
+            query = query.filter_search(**search)
+        if self.collapse != ['']:
+            query = query.collapse_children(self.collapse)
+        if self.highlight != ['']:
+            query = query.add_attribute_by_regex(self.highlight, ['color', 'style'], ['red', 'filled'])
+        return query
+
+    def network_stream(self, center: str = None, tags: list = None, search: dict = None) -> NetworkStream:
+        """
+        Returns the serializer of the current query around center for the current snapshot.
+        """
+        snapshot = self.get_graph().snapshot
+        query = self.query(tags, search).normalized()
+        key = (query.steps, snapshot.version, center)
+        stream = self.stream_cache.get(key)
+        if stream is None:
+            with metrics.stage('query'):
+                view = query.run(snapshot).view
+            with metrics.stage('order'):
+                stream = self.stream_cache.put(key, NetworkStream(view, center, snapshot.positions))
+        return stream
+
+    def start_export(self, format: str, query: GraphQuery) -> ExportJob:
+        """
+        Returns the job that exports the result of query on the current snapshot. Exports are keyed by the stats of the
+        wiki files, the query and the format, so a job for the same export is shared and finished exports are reused,
+        also after a restart.
+        """
+        check_format(format)
+        # Reloads hold the lock, so the digest belongs to the snapshot.
+        with self.lock:
+            snapshot = self.vimwikigraph.snapshot
+            digest = self.vimwikigraph.stats_digest()
+        query = query.normalized()
+        key = self.exports.key(digest, query.steps, format)
+        with self.export_lock:
+            job = self.export_jobs.get(key)
+        if job is not None and job.status in ('running', 'rendering'):
+            return job
+        job = ExportJob(None, self.exports, key, format, snapshot.positions,
+                        app.config.get('EXPORT_GRAPHVIZ_ENGINE', 'dot'))
+        # The query runs without the lock, so status polls do not wait for it, and the job is only registered once it
+        # ran, so a query that fails leaves no job behind.
+        if job.status == 'running':
+            with metrics.stage('query'):
+                job.view = query.run(snapshot).view
+        with self.export_lock:
+            registered = self.export_jobs.get(key)
+            if registered is not None and registered.status in ('running', 'rendering'):
+                # Another request started the same export meanwhile.
+                return registered
+            self.export_jobs.put(key, job)
+        if job.status == 'running':
+            job.start()
+        return job
+
+    def highlight_spans(self, node: str, highlights: list, snapshot) -> list:
+        """
+        Returns the highlight spans of the text of node in snapshot. Spans are cached by the node, the set of highlights
+        and the snapshot version.
+        """
+        highlights = tuple(sorted({highlight for highlight in highlights if highlight}))
+        if not highlights:
+            return []
+        key = (node, highlights, snapshot.version)
+        spans = self.highlight_cache.get(key)
+        if spans is None:
+            with metrics.stage('highlight'):
+                spans = self.highlight_cache.put(key, highlight_spans(snapshot.lines.text(node), highlights))
+        return spans
+
+    def request_tags(self) -> list:
+        """
+        Returns the tags of the 'tags' parameter of the current request.
+        """
+        return [tag for tag in request.args.get('tags', '').split(self.SEP) if tag]
+
+    def request_search(self) -> dict:
+        """
+        Returns the arguments of filter_search of the 'search', 'search_k', 'search_depth' and 'search_boost'
+        parameters of the current request, or None without a search.
+        """
+        query = request.args.get('search', '').strip()
+        if not query:
+            return None
+        return {
+            'query': query,
+            'k': request.args.get('search_k', app.config.get('SEARCH_RESULTS', 10), type=int),
+            'depth': request.args.get('search_depth', 0, type=int),
+            'boost': request.args.get('search_boost', app.config.get('SEARCH_BOOST', 0.0), type=float),
+        }
+
     def __str__(self):
         msg = "Filter"
         if self.invert_filter:
@@ -101,27 +281,95 @@ def route_index():
         return rendered
 
 
+def network_response(query: GraphQuery):
+    """
+    Returns the vis.js network of a query of the current snapshot as a conditional JSON response.
+    """
+    state = State.get_instance()
+    snapshot = state.get_graph().snapshot
+    query = query.normalized()
+    key = (query.steps, snapshot.version)
+    entry = state.network_cache.get(key)
+    if entry is None:
+        with metrics.stage('query'):
+            view = query.run(snapshot).view
+        with metrics.stage('serialize'):
+            body = json.dumps(NetworkStream(view, positions=snapshot.positions).json()).encode()
+        # The ETag is derived from the body rather than the key, as versions restart at 0 with the server.
+        entry = state.network_cache.put(key, (hashlib.blake2b(body, digest_size=16).hexdigest(), body))
+    etag, body = entry
+    response = make_response(body)
+    response.mimetype = 'application/json'
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
 @app.route('/network')
 def network_json():
     state = State.get_instance()
-    graph = state.get_graph().reset_graph()
-    if state.filename_filter != ['']:
-        graph = graph.filter_filenames(state.filename_filter, invert=state.invert_filename_filter)
-    if state.filter != ['']:
-        graph = graph.filter_nodes(state.filter, invert=state.invert_filter)
-    if state.collapse != ['']:
-        graph = graph.collapse_children(state.collapse)
-    if state.highlight != ['']:
-        attributes = ['color', 'style']
-        values = ['red', 'filled']
-        graph = graph.add_attribute_by_regex(state.highlight, attributes, values)
-    network = Network(
-        neighborhood_highlight=True,
-        filter_menu=True,
-        cdn_resources='remote',
+    return network_response(state.query(state.request_tags(), state.request_search()))
+
+
+@app.route('/neighborhood')
+def neighborhood_json():
+    """
+    Returns the network of the nodes that are linked from or to node up to depth, following links ('out'), backlinks
+    ('in') or both. At most limit nodes are returned, closest first.
+    """
+    state = State.get_instance()
+    node = request.args.get('node', '')
+    depth = request.args.get('depth', 1, type=int)
+    direction = request.args.get('direction', 'both')
+    limit = request.args.get('limit', None, type=int)
+    if direction not in ('in', 'out', 'both'):
+        return json.dumps({'error': f"Invalid direction '{direction}', expected 'in', 'out' or 'both'"}), 400
+    if not node:
+        return json.dumps({'error': 'Missing node'}), 400
+    query = state.query(state.request_tags(), state.request_search())
+    query = query.remove_nonadjacent_nodes(node, depth, direction, limit)
+    try:
+        return network_response(query)
+    except KeyError:
+        return json.dumps({'error': f"Unknown node '{node}'"}), 404
+
+
+@app.route('/network/page')
+def network_page():
+    """
+    Returns the nodes in [offset, offset + limit) of the network ordered breadth first around center and the edges
+    between them and the nodes of the previous pages. Only nodes that have all of the separated 'tags' are included
+    and, with a 'search', only its best matches and their neighborhoods.
+    """
+    state = State.get_instance()
+    stream = state.network_stream(request.args.get('center'), state.request_tags(), state.request_search())
+    offset = request.args.get('offset', 0, type=int)
+    limit = request.args.get('limit', app.config.get('NETWORK_PAGE_SIZE', 500), type=int)
+    return json.dumps(stream.json(offset, limit))
+
+
+@app.route('/network/stream')
+def network_stream():
+    """
+    Streams the network as newline delimited JSON batches, starting with the neighborhood of center. Only nodes that
+    have all of the separated 'tags' are included and, with a 'search', only its best matches and their
+    neighborhoods.
+    """
+    state = State.get_instance()
+    stream = state.network_stream(request.args.get('center'), state.request_tags(), state.request_search())
+    offset = request.args.get('offset', 0, type=int)
+    limit = request.args.get('limit', None, type=int)
+    batch = request.args.get('batch', app.config.get('NETWORK_PAGE_SIZE', 500), type=int)
+    encoding = accepted_encoding(request.accept_encodings) if app.config.get('NETWORK_COMPRESSION', True) else None
+    response = Response(
+        compress(stream.ndjson(offset, limit, max(1, batch)), encoding),
+        mimetype='application/x-ndjson',
     )
-    network.from_nx(graph.graph)
-    return network.to_json(max_depth=3)
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    response.cache_control.no_cache = True
+    return response
 
 
 @app.route('/node', methods=['POST'])
@@ -129,19 +377,220 @@ def node_json():
     state = State.get_instance()
     if request.json and 'node' in request.json:
         node = request.json['node']
-        lines = ''.join(state.vimwikigraph.lines[node])
-        for highlight in state.highlight:
-            lines = re.sub(highlight, r'<span style="background:red">\g<0></span>', lines, flags=re.IGNORECASE)
+        snapshot = state.vimwikigraph.snapshot
+        lines = render(snapshot.lines.text(node), state.highlight_spans(node, state.highlight, snapshot))
     else:
         lines = []
     return json.dumps({'text': lines})
 
 
+@app.route('/nodes', methods=['POST'])
+def nodes_json():
+    """
+    Streams the highlighted texts of many nodes as newline delimited JSON with one {"node", "text", "matches"} object
+    per line. The request body is a JSON object with the list of 'nodes' and optionally the 'highlight' regexes, which
+    default to the current highlights, and a snippet 'window'. With a window only the text within window characters
+    of the matches is returned.
+    """
+    state = State.get_instance()
+    body = request.get_json(silent=True) or dict()
+    nodes = body.get('nodes')
+    highlights = body.get('highlight', state.highlight)
+    window = body.get('window')
+    if not isinstance(nodes, list) or not isinstance(highlights, list):
+        return json.dumps({'error': "Expected a JSON object with a list of 'nodes'"}), 400
+    if window is not None and (not isinstance(window, int) or window < 0):
+        return json.dumps({'error': f"Invalid window '{window}', expected a non-negative integer"}), 400
+    for highlight in highlights:
+        if highlight:
+            compile_pattern(highlight, re.IGNORECASE)
+    snapshot = state.vimwikigraph.snapshot
+    batch = max(1, app.config.get('NODES_BATCH_SIZE', 50))
+
+    def generate():
+        for start in range(0, len(nodes), batch):
+            chunk = list()
+            for node in nodes[start:start + batch]:
+                text = snapshot.lines.text(node)
+                spans = state.highlight_spans(node, highlights, snapshot)
+                text = render(text, spans) if window is None else render_snippets(text, spans, window)
+                chunk.append(json.dumps({'node': node, 'text': text, 'matches': len(spans)}).encode() + b'\n')
+            yield b''.join(chunk)
+
+    encoding = accepted_encoding(request.accept_encodings) if app.config.get('NETWORK_COMPRESSION', True) else None
+    response = Response(compress(generate(), encoding), mimetype='application/x-ndjson')
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    response.vary.add('Accept-Encoding')
+    return response
+
+
+@app.route('/search')
+def search_json():
+    """
+    Returns the k documents that best match the full-text query q, ranked by BM25, with the matches highlighted in
+    snippets of window characters around them. Quoted words match a phrase, 'word*' a prefix and '-word' excludes
+    documents. A boost weights the ranking by the pagerank of the documents in the link graph. The same query as the
+    'search' parameter of /network keeps only the results and their neighborhoods.
+    """
+    state = State.get_instance()
+    text = request.args.get('q', '')
+    k = request.args.get('k', app.config.get('SEARCH_RESULTS', 10), type=int)
+    boost = request.args.get('boost', app.config.get('SEARCH_BOOST', 0.0), type=float)
+    window = request.args.get('window', app.config.get('SEARCH_SNIPPET_WINDOW', 60), type=int)
+    query = SearchQuery(text)
+    if not query:
+        return json.dumps({'error': 'Missing query'}), 400
+    if k is None or k < 1:
+        return json.dumps({'error': f"Invalid k '{request.args.get('k')}', expected a positive integer"}), 400
+    if window is None or window < 0:
+        error = f"Invalid window '{request.args.get('window')}', expected a non-negative integer"
+        return json.dumps({'error': error}), 400
+    snapshot = state.get_graph().snapshot
+    with metrics.stage('search'):
+        results, total = VimwikiGraph.from_snapshot(snapshot).search(query, k, boost)
+    highlights = query.highlights()
+    with metrics.stage('snippets'):
+        results = [{
+            'node': node,
+            'score': score,
+            'snippet': render_snippets(snapshot.lines.text(node), state.highlight_spans(node, highlights, snapshot),
+                                       window),
+        } for node, score in results]
+    return json.dumps({'query': text, 'total': total, 'results': results})
+
+
+@app.route('/export', methods=['POST'])
+def export_start():
+    """
+    Starts exporting the network of the current form values, 'tags' and 'search' in the background and returns the
+    job, which can be polled at its URL. The format is one of dot, gml, graphml, json, msgpack, html or png, svg and
+    pdf, which are rendered by Graphviz. A finished export of the same files, query and format is returned right away.
+    """
+    state = State.get_instance()
+    format = request.args.get('format', 'graphml')
+    try:
+        job = state.start_export(format, state.query(state.request_tags(), state.request_search()))
+    except ValueError as e:
+        return json.dumps({'error': str(e)}), 400
+    return export_job_response(job, 200 if job.status == 'done' else 202)
+
+
+def export_job_response(job: ExportJob, status: int = 200):
+    body = job.json()
+    body['url'] = url_for('export_job', job_id=job.key)
+    if job.status == 'done':
+        body['download'] = url_for('export_download', job_id=job.key)
+    return json.dumps(body), status
+
+
+@app.route('/export/<job_id>', methods=['GET', 'DELETE'])
+def export_job(job_id):
+    """
+    Returns the status and progress of an export job. DELETE cancels a running job and forgets a finished one.
+    """
+    state = State.get_instance()
+    job = state.export_jobs.get(job_id)
+    if job is None:
+        return json.dumps({'error': f"Unknown export '{job_id}'"}), 404
+    if request.method == 'DELETE':
+        if job.is_alive():
+            job.cancel()
+            job.join(timeout=1.0)
+        else:
+            state.export_jobs.pop(job_id)
+    return export_job_response(job)
+
+
+@app.route('/export/<job_id>/download')
+def export_download(job_id):
+    state = State.get_instance()
+    job = state.export_jobs.get(job_id)
+    if job is None:
+        return json.dumps({'error': f"Unknown export '{job_id}'"}), 404
+    if job.status != 'done':
+        return json.dumps({'error': f"Export '{job_id}' is {job.status}"}), 409
+    path = state.exports.get(job.key, job.format)
+    if path is None:
+        return json.dumps({'error': f"Export '{job_id}' was evicted from the cache"}), 410
+    return send_file(path, as_attachment=True, download_name=f'{state.vimwikigraph.graph_name}.{job.format}')
+
+
+@app.before_request
+def start_request():
+    if metrics.enabled:
+        g.start = time.perf_counter()
+        metrics.start_request()
+    if app.config.get('PROFILING', False) and request.args.get('profile') and request.endpoint != 'profile':
+        g.profile = cProfile.Profile()
+        g.profile.enable()
+
+
+@app.after_request
+def finish_request(response):
+    """
+    Adds the stages of the request as a Server-Timing header and stores the profile of a request with a 'profile'
+    parameter, whose URL is returned in the X-Profile header. Streamed bodies are generated after this and are not
+    included.
+    """
+    profiler = g.pop('profile', None)
+    if profiler is not None:
+        profiler.disable()
+        profile_id = uuid.uuid4().hex
+        State.get_instance().profiles.put(profile_id, profiler)
+        response.headers['X-Profile'] = url_for('profile', profile_id=profile_id)
+    if metrics.enabled and 'start' in g:
+        seconds = time.perf_counter() - g.pop('start')
+        metrics.observe_request(request.endpoint or 'unknown', seconds)
+        timings = metrics.end_request() + [('total', seconds)]
+        response.headers['Server-Timing'] = ', '.join(f'{name};dur={duration * 1000:.2f}' for name, duration in timings)
+    return response
+
+
+@app.route('/metrics')
+def metrics_text():
+    """
+    Returns the stage durations, node and edge counts and cache statistics in the Prometheus text format.
+    """
+    if not metrics.enabled:
+        return json.dumps({'error': 'Metrics are disabled, set METRICS = True'}), 404
+    snapshot = State.get_instance().get_graph().snapshot
+    body = metrics.render({
+        'vimwikigraph_nodes': ('Number of nodes of the link graph.', snapshot.graph.number_of_nodes()),
+        'vimwikigraph_edges': ('Number of edges of the link graph.', snapshot.graph.number_of_edges()),
+        'vimwikigraph_snapshot_version': ('Number of reloads that changed the wiki.', snapshot.version),
+    })
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+
+@app.route('/profile/<profile_id>')
+def profile(profile_id):
+    """
+    Returns a stored request profile, either in the binary pstats format or as text with format=text.
+    """
+    stored = State.get_instance().profiles.get(profile_id)
+    if stored is None:
+        return json.dumps({'error': f"Unknown profile '{profile_id}'"}), 404
+    if request.args.get('format') == 'text':
+        stream = io.StringIO()
+        pstats.Stats(stored, stream=stream).sort_stats('cumulative').print_stats(50)
+        return Response(stream.getvalue(), mimetype='text/plain')
+    stored.create_stats()
+    response = Response(marshal.dumps(stored.stats), mimetype='application/octet-stream')
+    response.headers['Content-Disposition'] = f'attachment; filename={profile_id}.prof'
+    return response
+
+
+@app.errorhandler(InvalidPatternError)
+def invalid_pattern(e):
+    return json.dumps({'error': str(e)}), 400
+
+
 @app.route('/reload', methods=['POST'])
 def reload():
     state = State.get_instance()
-    state.vimwikigraph.reload_graph()
-    state.vimwikitags.reload()
+    with state.lock:
+        state.vimwikigraph.reload_graph()
     state.set_form(
         request.form['inptFilter'],
         'inptInvertFilter' in request.form,
@@ -180,10 +629,59 @@ def reset():
 @app.route('/tags', methods=['GET'])
 def tags():
     state = State.get_instance()
-    count_dict = state.vimwikitags.populate_tags()
+    count_dict = state.get_graph().snapshot.tags.populate_tags()
     tags = [tag for tag in list(count_dict.keys()) if tag not in state.exclude_tags]
     return json.dumps({'tags': tags[:state.n_tags]})
 
 
+@app.cli.command('warm-cache')
+def warm_cache():
+    """Parse the wiki into CACHE_PATH so that the server starts quickly."""
+    cache_path = app.config.get('CACHE_PATH', '')
+    if not cache_path:
+        raise click.UsageError('CACHE_PATH is not set in the config file')
+    vimwikigraphdir = os.environ.get('VIMWIKIDIR', '')
+    if not vimwikigraphdir:
+        raise click.UsageError('VIMWIKIDIR environment variable is not set')
+    vimwikigraph = open_vimwikigraph(vimwikigraphdir, cache_path)
+    click.echo(f'Cached {len(vimwikigraph.file_stats)} files in {vimwikigraph.cache.path}')
+
+
+@app.cli.command('export')
+@click.argument('output', type=click.Path(dir_okay=False))
+@click.option('--format', '-f', 'format', type=click.Choice(FORMATS + GRAPHVIZ_FORMATS),
+              help='Format of the export. Defaults to the extension of OUTPUT.')
+@click.option('--filter', 'filters', multiple=True, help='Only export nodes whose text matches all of these regexes.')
+@click.option('--tag', 'tags', multiple=True, help='Only export nodes with all of these tags.')
+@click.option('--search', help='Only export the best matches of a full-text query.')
+def export_graph(output, format, filters, tags, search):
+    """Export the graph of the wiki to OUTPUT without starting the server."""
+    vimwikigraphdir = os.environ.get('VIMWIKIDIR', '')
+    if not vimwikigraphdir:
+        raise click.UsageError('VIMWIKIDIR environment variable is not set')
+    format = format or os.path.splitext(output)[1].lstrip('.')
+    try:
+        check_format(format)
+    except ValueError as e:
+        raise click.UsageError(str(e))
+    vimwikigraph = open_vimwikigraph(vimwikigraphdir, app.config.get('CACHE_PATH', ''))
+    query = GraphQuery()
+    if filters:
+        query = query.filter_nodes(list(filters))
+    if tags:
+        query = query.filter_tags(list(tags))
+    if search:
+        query = query.filter_search(search, app.config.get('SEARCH_RESULTS', 10))
+    view = query.run(vimwikigraph.snapshot).view
+
+    def progress(stage, written):
+        if stage == 'render':
+            click.echo(f"Rendering with {app.config.get('EXPORT_GRAPHVIZ_ENGINE', 'dot')}")
+
+    export(view, output, format, vimwikigraph.snapshot.positions, progress,
+           app.config.get('EXPORT_GRAPHVIZ_ENGINE', 'dot'))
+    click.echo(f'Exported {view.number_of_nodes()} nodes to {output}')
+
+
 def create_app():
     return app
@@ -0,0 +1,141 @@
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import threading
+import zlib
+
+from .ingest import NO_ATTRIBUTES
+
+
+class ParseCache:
+    """
+    Persistent SQLite cache of parsed wiki files. Each entry is keyed by path and stores the file's mtime, size and
+    hash together with its compressed text, outgoing links with their attributes and tags. It also keeps the layout
+    positions of the nodes. The whole cache is cleared when its schema version or the fingerprint of the parser
+    settings changes.
+    """
+
+    VERSION = 4
+
+    def __init__(self, path: str, settings: dict):
+        """
+        Args:
+            path (str): Location of the SQLite database. Missing directories are created.
+            settings (dict): Parser settings such as file extensions and the link regex. Any change invalidates the
+                cache.
+        """
+        self.path = os.path.expanduser(path)
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.fingerprint = hashlib.blake2b(
+            json.dumps([self.VERSION, settings], sort_keys=True).encode(), digest_size=16
+        ).hexdigest()
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, check_same_thread=False)
+        with self.db:
+            self.db.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        stale = self.get_meta('fingerprint') != self.fingerprint
+        with self.db:
+            if stale:
+                # Tables of an older version may have a different schema.
+                self.db.execute('DROP TABLE IF EXISTS files')
+                self.db.execute('DROP TABLE IF EXISTS positions')
+            self.db.execute(
+                'CREATE TABLE IF NOT EXISTS files '
+                '(path TEXT PRIMARY KEY, mtime INTEGER, size INTEGER, digest TEXT, text BLOB, links TEXT, tags TEXT)'
+            )
+            self.db.execute('CREATE TABLE IF NOT EXISTS positions (node TEXT PRIMARY KEY, x REAL, y REAL)')
+        if stale:
+            self.clear()
+
+    def clear(self):
+        with self.lock, self.db:
+            self.db.execute('DELETE FROM files')
+            self.db.execute('DELETE FROM positions')
+            self.db.execute('DELETE FROM meta')
+            self.db.execute('INSERT INTO meta VALUES (?, ?)', ('fingerprint', json.dumps(self.fingerprint)))
+
+    def get_meta(self, key: str):
+        with self.lock:
+            row = self.db.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def set_meta(self, key: str, value):
+        with self.lock, self.db:
+            self.db.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', (key, json.dumps(value)))
+
+    def load(self) -> dict:
+        """
+        Returns a dict mapping each cached path to its ((mtime, size, hash), compressed text, links, tags) entry. The
+        text, links and tags are decoded lazily with ParseCache.text, ParseCache.links and ParseCache.tags.
+        """
+        with self.lock:
+            rows = self.db.execute('SELECT path, mtime, size, digest, text, links, tags FROM files').fetchall()
+        return {path: ((mtime, size, digest), text, links, tags)
+                for path, mtime, size, digest, text, links, tags in rows}
+
+    @staticmethod
+    def text(text: bytes) -> str:
+        return zlib.decompress(text).decode()
+
+    @staticmethod
+    def links(links: str) -> dict:
+        targets = json.loads(links)
+        attributes = targets.pop() if targets and isinstance(targets[-1], dict) else dict()
+        links = dict.fromkeys(map(sys.intern, targets), NO_ATTRIBUTES)
+        for position, value in attributes.items():
+            links[targets[int(position)]] = value
+        return links
+
+    @staticmethod
+    def encode_links(links: dict) -> str:
+        """
+        Encodes links as the list of their targets followed, if any link has attributes, by a dict that maps the
+        positions of those links to their attributes.
+        """
+        targets = list(links)
+        attributes = {position: value for position, value in enumerate(links.values()) if value}
+        return json.dumps(targets + [attributes] if attributes else targets)
+
+    @staticmethod
+    def tags(tags: str) -> dict:
+        return json.loads(tags)
+
+    def put(self, entries: dict):
+        """
+        Stores entries of the form path -> ((mtime, size, hash), text, links, tags).
+        """
+        rows = [
+            (path, *stats, zlib.compress(text.encode()), self.encode_links(links), json.dumps(tags))
+            for path, (stats, text, links, tags) in entries.items()
+        ]
+        with self.lock, self.db:
+            self.db.executemany('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def delete(self, paths: list):
+        with self.lock, self.db:
+            self.db.executemany('DELETE FROM files WHERE path = ?', [(path,) for path in paths])
+
+    def load_positions(self) -> dict:
+        """
+        Returns a dict mapping nodes to their cached (x, y) positions.
+        """
+        with self.lock:
+            rows = self.db.execute('SELECT node, x, y FROM positions').fetchall()
+        return {node: (x, y) for node, x, y in rows}
+
+    def put_positions(self, positions: dict):
+        with self.lock, self.db:
+            self.db.executemany('INSERT OR REPLACE INTO positions VALUES (?, ?, ?)',
+                                [(node, x, y) for node, (x, y) in positions.items()])
+
+    def delete_positions(self, nodes: list):
+        with self.lock, self.db:
+            self.db.executemany('DELETE FROM positions WHERE node = ?', [(node,) for node in nodes])
+
+    def close(self):
+        with self.lock:
+            self.db.close()
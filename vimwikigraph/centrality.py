@@ -0,0 +1,132 @@
+import random
+import threading
+import weakref
+from collections import deque
+
+import numpy as np
+
+from .lru import LRUCache
+
+
+METRICS = ('betweenness', 'pagerank', 'in_degree', 'out_degree', 'degree')
+
+# Results by base graph. A reload copies the base graph only if it changes the link structure, so reloads that only
+# change the text of files keep their results and results of replaced graphs are dropped together with the graph.
+_results = weakref.WeakKeyDictionary()
+_results_lock = threading.Lock()
+
+
+def clear_cache():
+    """
+    Drops all cached results.
+    """
+    with _results_lock:
+        _results.clear()
+
+
+def betweenness(n: int, sources: np.ndarray, targets: np.ndarray, k: int = None, seed: int = 0) -> np.ndarray:
+    """
+    Unnormalized betweenness centrality of a directed graph with Brandes' algorithm.
+
+    Args:
+        n (int): Number of nodes.
+        sources (np.ndarray): Source node of every edge.
+        targets (np.ndarray): Target node of every edge.
+        k (int): Number of sampled pivots. Exact if None or not smaller than n, otherwise the result is an estimate
+            whose error shrinks with k.
+        seed (int): Seed of the pivot sampling.
+    """
+    successors = [[] for _ in range(n)]
+    for u, v in zip(sources.tolist(), targets.tolist()):
+        successors[u].append(v)
+    pivots = range(n)
+    if k is not None and k < n:
+        pivots = random.Random(seed).sample(range(n), k)
+    centrality = [0.0] * n
+    # Only the nodes reached from a pivot are tracked, as most pivots reach a small part of a wiki.
+    for s in pivots:
+        order = []
+        predecessors = {s: []}
+        sigma = {s: 1}
+        distance = {s: 0}
+        queue = deque([s])
+        while queue:
+            v = queue.popleft()
+            order.append(v)
+            next_distance = distance[v] + 1
+            for w in successors[v]:
+                if w not in distance:
+                    distance[w] = next_distance
+                    sigma[w] = 0
+                    predecessors[w] = []
+                    queue.append(w)
+                if distance[w] == next_distance:
+                    sigma[w] += sigma[v]
+                    predecessors[w].append(v)
+        delta = dict.fromkeys(order, 0.0)
+        for w in reversed(order):
+            coefficient = (1 + delta[w]) / sigma[w]
+            for v in predecessors[w]:
+                delta[v] += sigma[v] * coefficient
+            if w != s:
+                centrality[w] += delta[w]
+    return np.array(centrality)
+
+
+def pagerank(n: int, sources: np.ndarray, targets: np.ndarray, alpha: float = 0.85, tol: float = 1e-6,
+             max_iter: int = 100) -> np.ndarray:
+    """
+    PageRank by power iteration. Dangling nodes link to every node.
+    """
+    if not n:
+        return np.zeros(0)
+    out_degree = np.bincount(sources, minlength=n).astype(float)
+    dangling = out_degree == 0
+    weights = 1 / out_degree[sources]
+    x = np.full(n, 1 / n)
+    for _ in range(max_iter):
+        previous = x
+        x = alpha * np.bincount(targets, weights=x[sources] * weights, minlength=n)
+        x += (alpha * previous[dangling].sum() + 1 - alpha) / n
+        if np.abs(x - previous).sum() < n * tol:
+            break
+    return x
+
+
+def centrality(view, metric: str = 'betweenness', k: int = None, seed: int = 0):
+    """
+    Computes a centrality metric of the visible graph of a GraphView. Results are cached by the base graph, the nodes
+    hidden or contracted in the view and the arguments.
+
+    Args:
+        view (GraphView)
+        metric (str): One of METRICS.
+        k (int): Number of pivots of an approximate betweenness centrality. Exact if None.
+        seed (int): Seed of the pivot sampling.
+
+    Returns:
+        tuple: The list of visible nodes and an array of their centralities.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Invalid metric '{metric}', expected one of {', '.join(METRICS)}")
+    if metric != 'betweenness':
+        k = seed = None
+    key = (metric, k, seed, frozenset(view.hidden), frozenset(view.merged.items()))
+    with _results_lock:
+        results = _results.setdefault(view.base, LRUCache(max_entries=16))
+    result = results.get(key)
+    if result is not None:
+        return result
+    nodes, sources, targets = view.adjacency()
+    n = len(nodes)
+    if metric == 'betweenness':
+        values = betweenness(n, sources, targets, k=k, seed=seed)
+    elif metric == 'pagerank':
+        values = pagerank(n, sources, targets)
+    elif metric == 'in_degree':
+        values = np.bincount(targets, minlength=n).astype(float)
+    elif metric == 'out_degree':
+        values = np.bincount(sources, minlength=n).astype(float)
+    else:
+        values = np.bincount(np.concatenate([sources, targets]), minlength=n).astype(float)
+    return results.put(key, (nodes, values))
@@ -0,0 +1,289 @@
+import itertools
+
+import numpy as np
+
+
+class NodeAttributes:
+    """
+    Read-only mapping of the nodes of a CSRGraph to their attributes, like the nodes view of a networkx graph.
+    """
+
+    def __init__(self, graph: 'CSRGraph'):
+        self._graph = graph
+
+    def __getitem__(self, node) -> dict:
+        i = self._graph.index[node]
+        return {attribute: column[i] for attribute, column in self._graph.columns.items() if column[i] is not None}
+
+    def __contains__(self, node):
+        return node in self._graph.index
+
+    def __iter__(self):
+        return iter(self._graph.names)
+
+    def __len__(self):
+        return len(self._graph.names)
+
+    def __call__(self, data: bool = False):
+        if not data:
+            return iter(self._graph.names)
+        return ((node, self[node]) for node in self._graph.names)
+
+
+class CSRGraph:
+    """
+    Immutable directed graph with a compact memory layout. Node paths are interned and mapped to integer ids, the
+    forward and reverse adjacency are stored as CSR arrays and attributes are stored in one column per attribute.
+    It provides the read-only part of the networkx DiGraph interface that GraphView and VimwikiGraph use, changes
+    build a new graph with patch().
+    """
+
+    def __init__(self, name: str, nodes: list, columns: dict = None, edges=(), edge_columns: dict = None):
+        """
+        Args:
+            name (str): Name of the graph.
+            nodes (list): Nodes in order. Edge endpoints that are missing are appended in order of first occurrence.
+            columns (dict): Maps attribute names to lists of values aligned with nodes. None marks a missing value.
+            edges: Iterable of (u, v) pairs. Duplicates are ignored.
+            edge_columns (dict): Maps attribute names to dicts from (u, v) to values.
+        """
+        self.graph = {'name': name}
+        self.names = list(dict.fromkeys(nodes))
+        self.index = {node: i for i, node in enumerate(self.names)}
+        columns = columns or dict()
+        self.columns = {attribute: list(values) + [None] * (len(self.names) - len(values))
+                        for attribute, values in columns.items()}
+        sources, targets = list(), list()
+        # Maps every edge to its position in sources and targets.
+        positions = dict()
+        for u, v in edges:
+            if (u, v) in positions:
+                continue
+            positions[(u, v)] = len(sources)
+            sources.append(self.__intern(u))
+            targets.append(self.__intern(v))
+        sources = np.array(sources, dtype=np.int32)
+        targets = np.array(targets, dtype=np.int32)
+        # Stable sorts keep the successors and predecessors of every node in insertion order.
+        forward = np.argsort(sources, kind='stable')
+        self.edge_columns = dict()
+        # Edge attributes are stored in the order of indices, i.e. at the rank of their position.
+        rank = np.empty(len(forward), dtype=np.int64)
+        rank[forward] = np.arange(len(forward))
+        for attribute, values in (edge_columns or dict()).items():
+            column = [None] * len(forward)
+            for edge, value in values.items():
+                if edge in positions:
+                    column[rank[positions[edge]]] = value
+            self.edge_columns[attribute] = column
+        self.__set_adjacency(sources, targets, forward)
+
+    def __set_adjacency(self, sources: np.ndarray, targets: np.ndarray, forward: np.ndarray):
+        """
+        Builds the forward and reverse CSR arrays from the edges (sources[i], targets[i]). forward orders the edges by
+        their source, the predecessors of every node are kept in the order of the edges.
+        """
+        n = len(self.names)
+        self.indptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(sources, minlength=n), out=self.indptr[1:])
+        self.indices = targets[forward]
+        reverse = np.argsort(targets, kind='stable')
+        self.rindptr = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(np.bincount(targets, minlength=n), out=self.rindptr[1:])
+        self.rindices = sources[reverse]
+        # Memoryviews index and slice to Python ints much faster than numpy arrays do.
+        self._forward = (memoryview(self.indptr), memoryview(self.indices))
+        self._reverse = (memoryview(self.rindptr), memoryview(self.rindices))
+        self.nodes = NodeAttributes(self)
+
+    def __intern(self, node) -> int:
+        i = self.index.get(node)
+        if i is None:
+            i = self.index[node] = len(self.names)
+            self.names.append(node)
+            for column in self.columns.values():
+                column.append(None)
+        return i
+
+    # {{{ Queries
+    def __contains__(self, node):
+        return node in self.index
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def has_node(self, node):
+        return node in self.index
+
+    def number_of_nodes(self):
+        return len(self.names)
+
+    def number_of_edges(self):
+        return len(self.indices)
+
+    def successors(self, node):
+        i = self.index[node]
+        indptr, indices = self._forward
+        return map(self.names.__getitem__, indices[indptr[i]:indptr[i + 1]])
+
+    def predecessors(self, node):
+        i = self.index[node]
+        indptr, indices = self._reverse
+        return map(self.names.__getitem__, indices[indptr[i]:indptr[i + 1]])
+
+    def out_degree(self, node):
+        i = self.index[node]
+        indptr = self._forward[0]
+        return indptr[i + 1] - indptr[i]
+
+    def in_degree(self, node):
+        i = self.index[node]
+        indptr = self._reverse[0]
+        return indptr[i + 1] - indptr[i]
+
+    def out_edges(self, node):
+        return ((node, successor) for successor in self.successors(node))
+
+    def __edge_attributes(self, position) -> dict:
+        return {attribute: column[position] for attribute, column in self.edge_columns.items()
+                if column[position] is not None}
+
+    def get_edge_data(self, u, v, default=None):
+        """
+        Returns a copy of the attributes of the edge (u, v), or default if there is no such edge.
+        """
+        i, j = self.index.get(u), self.index.get(v)
+        if i is None or j is None:
+            return default
+        indptr, indices = self._forward
+        for position in range(indptr[i], indptr[i + 1]):
+            if indices[position] == j:
+                return self.__edge_attributes(position)
+        return default
+
+    def sources(self) -> np.ndarray:
+        """
+        Returns the source id of every edge in the order of indices.
+        """
+        return np.repeat(np.arange(len(self.names), dtype=np.int32), np.diff(self.indptr))
+
+    def edges(self, data: bool = False):
+        names = self.names
+        edges = zip(map(names.__getitem__, self.sources().tolist()), map(names.__getitem__, self.indices.tolist()))
+        if not data:
+            return edges
+        return ((u, v, self.__edge_attributes(position)) for position, (u, v) in enumerate(edges))
+    # }}}
+
+    def patch(self, added_nodes: dict, removed_nodes, added_edges, removed_edges, removed_attributes: dict = None,
+              edge_attributes: dict = None):
+        """
+        Returns a new graph with the changes applied. Only the rows of nodes whose successors change are rebuilt, the
+        edges of all other rows are moved over with array operations.
+
+        Args:
+            added_nodes (dict): Maps new nodes to their attributes. Existing nodes get the attributes.
+            removed_nodes: Nodes to remove together with their edges.
+            added_edges: Iterable of (u, v) pairs to add.
+            removed_edges: Iterable of (u, v) pairs to remove.
+            removed_attributes (dict): Maps nodes to attributes to remove from them.
+            edge_attributes (dict): Maps added or existing edges to attributes that replace their current ones.
+        """
+        removed_nodes = set(removed_nodes)
+        removed_edges = set(removed_edges)
+        added_edges = [(u, v) for u, v in added_edges if u not in removed_nodes and v not in removed_nodes]
+        removed_attributes = removed_attributes or dict()
+        edge_attributes = edge_attributes or dict()
+        kept = np.ones(len(self.names), dtype=bool)
+        kept[[self.index[node] for node in removed_nodes if node in self.index]] = False
+        # Maps old ids to new ids. Removed nodes are dropped and new nodes are appended.
+        remap = (np.cumsum(kept) - 1).astype(np.int32)
+        graph = CSRGraph.__new__(CSRGraph)
+        graph.graph = dict(self.graph)
+        if kept.all():
+            ids = None
+            graph.names = list(self.names)
+            graph.index = dict(self.index)
+        else:
+            ids = np.flatnonzero(kept).tolist()
+            graph.names = list(map(self.names.__getitem__, ids))
+            graph.index = {node: i for i, node in enumerate(graph.names)}
+        for node in itertools.chain(added_nodes, itertools.chain.from_iterable(added_edges)):
+            if node not in graph.index and node not in removed_nodes:
+                graph.index[node] = len(graph.names)
+                graph.names.append(node)
+        graph.columns = dict()
+        for attribute in set(self.columns).union(*added_nodes.values()):
+            old = self.columns.get(attribute)
+            if old is None:
+                column = [None] * len(graph.names)
+            else:
+                column = list(map(old.__getitem__, ids)) if ids is not None else list(old)
+            column.extend([None] * (len(graph.names) - len(column)))
+            for node, attributes in removed_attributes.items():
+                if attribute in attributes and node in graph.index:
+                    column[graph.index[node]] = None
+            for node, attributes in added_nodes.items():
+                if attribute in attributes and node in graph.index:
+                    column[graph.index[node]] = attributes[attribute]
+            graph.columns[attribute] = column
+
+        # Rows whose successors change, i.e. sources of changed edges and predecessors of removed nodes.
+        dirty = {u for u, _ in itertools.chain(removed_edges, added_edges, edge_attributes)}
+        for node in removed_nodes:
+            if node in self.index:
+                dirty.update(self.predecessors(node))
+        rows = dict()
+        indptr, indices = self._forward
+        for u in dirty:
+            if u in removed_nodes:
+                continue
+            row = rows[u] = dict()
+            if u not in self.index:
+                continue
+            i = self.index[u]
+            for position in range(indptr[i], indptr[i + 1]):
+                v = self.names[indices[position]]
+                if v in removed_nodes or (u, v) in removed_edges:
+                    continue
+                row[v] = edge_attributes[(u, v)] if (u, v) in edge_attributes else self.__edge_attributes(position)
+        for u, v in added_edges:
+            if v not in rows[u]:
+                rows[u][v] = edge_attributes.get((u, v), dict())
+
+        old_sources = self.sources()
+        is_clean = kept.copy()
+        is_clean[[self.index[u] for u in rows if u in self.index]] = False
+        clean = np.flatnonzero(is_clean[old_sources])
+        edges = [(graph.index[u], graph.index[v], attributes) for u, row in rows.items()
+                 for v, attributes in row.items()]
+        sources = np.concatenate((remap[old_sources[clean]], np.array([u for u, _, _ in edges], dtype=np.int32)))
+        targets = np.concatenate((remap[self.indices[clean]], np.array([v for _, v, _ in edges], dtype=np.int32)))
+        # The edges of clean rows are still sorted, so the stable sort only has to merge in the rebuilt rows.
+        forward = np.argsort(sources, kind='stable')
+        order = forward.tolist()
+        clean = clean.tolist()
+        graph.edge_columns = dict()
+        for attribute in set(self.edge_columns).union(*(attributes for _, _, attributes in edges)):
+            old = self.edge_columns.get(attribute)
+            values = list(map(old.__getitem__, clean)) if old is not None else [None] * len(clean)
+            values.extend(attributes.get(attribute) for _, _, attributes in edges)
+            graph.edge_columns[attribute] = list(map(values.__getitem__, order))
+        graph.__set_adjacency(sources, targets, forward)
+        return graph
+
+    @classmethod
+    def from_networkx(cls, graph) -> 'CSRGraph':
+        columns = dict()
+        nodes = list(graph)
+        for i, node in enumerate(nodes):
+            for attribute, value in graph.nodes[node].items():
+                columns.setdefault(attribute, [None] * len(nodes))[i] = value
+        edge_columns = dict()
+        for u, v, attributes in graph.edges(data=True):
+            for attribute, value in attributes.items():
+                edge_columns.setdefault(attribute, dict())[(u, v)] = value
+        return cls(graph.graph.get('name', ''), nodes, columns, graph.edges(), edge_columns)
@@ -0,0 +1,62 @@
+import io
+from collections.abc import MutableMapping
+
+
+class DocumentStore(MutableMapping):
+    """
+    Keeps the text of each document once as a single buffer with normalized newlines and, optionally, a lowercased twin
+    that is built once when the document is stored. Indexing a document returns its lines for compatibility with code
+    that expects a dict of line lists.
+    """
+
+    def __init__(self, texts: dict = None, lowercase: bool = True):
+        """
+        Args:
+            texts (dict): Maps document names to their text or lines.
+            lowercase (bool): Store a lowercased copy of each document instead of lowercasing it on every search.
+        """
+        self.lowercase = lowercase
+        self.texts = dict()
+        self.lowered = dict()
+        for name, text in (texts or dict()).items():
+            self[name] = text
+
+    def __getitem__(self, name: str) -> list:
+        return io.StringIO(self.texts[name]).readlines()
+
+    def __setitem__(self, name: str, text):
+        if not isinstance(text, str):
+            text = ''.join(text)
+        self.texts[name] = text
+        if self.lowercase:
+            self.lowered[name] = text.lower()
+
+    def __delitem__(self, name: str):
+        del self.texts[name]
+        self.lowered.pop(name, None)
+
+    def __iter__(self):
+        return iter(self.texts)
+
+    def __len__(self):
+        return len(self.texts)
+
+    def __contains__(self, name):
+        return name in self.texts
+
+    def copy(self) -> 'DocumentStore':
+        """
+        Returns a shallow copy that shares the text buffers with this store.
+        """
+        store = DocumentStore(lowercase=self.lowercase)
+        store.texts = dict(self.texts)
+        store.lowered = dict(self.lowered)
+        return store
+
+    def text(self, name: str, default: str = '') -> str:
+        return self.texts.get(name, default)
+
+    def lower(self, name: str, default: str = '') -> str:
+        if self.lowercase:
+            return self.lowered.get(name, default)
+        return self.texts.get(name, default).lower()
@@ -0,0 +1,542 @@
+import hashlib
+import json
+import math
+import os
+import re
+import subprocess
+import tempfile
+import threading
+import time
+import traceback
+from xml.sax.saxutils import escape, quoteattr
+
+from pyvis.network import Network
+
+from .stream import NetworkStream, vis_edge, vis_node
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+# Formats written by the streaming writers and formats rendered from DOT by Graphviz.
+FORMATS = ('dot', 'gml', 'graphml', 'json', 'msgpack', 'html')
+GRAPHVIZ_FORMATS = ('png', 'svg', 'pdf')
+# Number of nodes or edges between two progress reports.
+PROGRESS_INTERVAL = 1000
+# Version of the JSON and msgpack graph format.
+GRAPH_FORMAT_VERSION = 1
+
+
+class ExportCancelled(Exception):
+    pass
+
+
+def check_format(format: str):
+    if format not in FORMATS + GRAPHVIZ_FORMATS:
+        raise ValueError(f"Invalid format '{format}', expected one of {', '.join(FORMATS + GRAPHVIZ_FORMATS)}")
+    if format == 'msgpack' and msgpack is None:
+        raise ValueError("Invalid format 'msgpack', install msgpack to use it")
+
+
+def _counted(items, progress, written: int = 0):
+    """
+    Yields items and calls progress with the number of items so far, starting at written, every PROGRESS_INTERVAL
+    items.
+    """
+    if progress is None:
+        yield from items
+        return
+    for count, item in enumerate(items, written + 1):
+        yield item
+        if count % PROGRESS_INTERVAL == 0:
+            progress(count)
+
+
+# {{{ DOT
+_DOT_ID = re.compile(r'[A-Za-z_][A-Za-z0-9_]*|-?(\.[0-9]+|[0-9]+(\.[0-9]*)?)')
+
+
+def dot_id(value) -> str:
+    """
+    Returns value as a DOT identifier, quoted unless it is a plain name or number. Values that are already quoted, e.g.
+    the labels of extend_node_label, are kept as they are.
+    """
+    value = str(value)
+    if _DOT_ID.fullmatch(value) or (len(value) > 1 and value[0] == value[-1] == '"'):
+        return value
+    return '"' + value.replace('"', '\\"') + '"'
+
+
+def _dot_attributes(attributes: dict) -> str:
+    if not attributes:
+        return ''
+    attributes = [f'{dot_id(key)}={dot_id(value)}' for key, value in attributes.items() if value is not None]
+    return f" [{', '.join(attributes)}]" if attributes else ''
+
+
+def write_dot(view, f, progress=None):
+    """
+    Writes a GraphView in the DOT language of Graphviz, laid out from left to right.
+    """
+    f.write(f'strict digraph {dot_id(view.name)} {{\nrankdir=LR;\n')
+    for node, attributes in _counted(view.nodes(data=True), progress):
+        f.write(f'{dot_id(node)}{_dot_attributes(attributes)};\n')
+    written = view.number_of_nodes()
+    for u, v, attributes in _counted(view.edges(data=True), progress, written):
+        f.write(f'{dot_id(u)} -> {dot_id(v)}{_dot_attributes(attributes)};\n')
+    f.write('}\n')
+# }}}
+
+
+# {{{ GML
+_GML_KEY = re.compile(r'[A-Za-z][0-9A-Za-z_]*')
+_GML_ESCAPE = re.compile(r'[^ -~]|[&"]')
+
+
+def _gml_value(value) -> str:
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, int):
+        return str(value)
+    if isinstance(value, float):
+        if math.isnan(value):
+            return 'NAN'
+        if math.isinf(value):
+            return 'INF' if value > 0 else '-INF'
+        return repr(value)
+    return '"' + _GML_ESCAPE.sub(lambda match: f'&#{ord(match.group(0))};', str(value)) + '"'
+
+
+def _gml_attributes(attributes: dict, indent: str) -> str:
+    if not attributes:
+        return ''
+    return ''.join(f'{indent}{key} {_gml_value(value)}\n' for key, value in attributes.items()
+                   if value is not None and key not in ('id', 'label') and _GML_KEY.fullmatch(key))
+
+
+def write_gml(view, f, progress=None):
+    """
+    Writes a GraphView in the GML format of networkx.write_gml. Nodes are labeled with their names, so
+    networkx.read_gml returns the same graph.
+    """
+    f.write(f'graph [\n  directed 1\n  name {_gml_value(view.name)}\n')
+    ids = dict()
+    for node, attributes in _counted(view.nodes(data=True), progress):
+        ids[node] = len(ids)
+        f.write(f'  node [\n    id {ids[node]}\n    label {_gml_value(node)}\n{_gml_attributes(attributes, "    ")}'
+                '  ]\n')
+    for u, v, attributes in _counted(view.edges(data=True), progress, len(ids)):
+        f.write(f'  edge [\n    source {ids[u]}\n    target {ids[v]}\n{_gml_attributes(attributes, "    ")}  ]\n')
+    f.write(']\n')
+# }}}
+
+
+# {{{ GraphML
+def _graphml_type(value) -> str:
+    if isinstance(value, bool):
+        return 'boolean'
+    if isinstance(value, int):
+        return 'long'
+    if isinstance(value, float):
+        return 'double'
+    return 'string'
+
+
+def _graphml_keys(items, keys: dict, domain: str):
+    """
+    Adds the attributes of items to keys, which maps (domain, attribute) to the GraphML key id and type. An attribute
+    with values of different types becomes a string.
+    """
+    for *_, attributes in items:
+        for attribute, value in attributes.items():
+            if value is None:
+                continue
+            key = keys.get((domain, attribute))
+            kind = _graphml_type(value)
+            if key is None:
+                keys[(domain, attribute)] = (f'd{len(keys)}', kind)
+            elif key[1] != kind:
+                keys[(domain, attribute)] = (key[0], 'string')
+
+
+def _graphml_data(attributes: dict, keys: dict, domain: str) -> str:
+    if not attributes:
+        return ''
+    data = list()
+    for attribute, value in attributes.items():
+        if value is None:
+            continue
+        value = str(value).lower() if isinstance(value, bool) else str(value)
+        data.append(f'<data key="{keys[(domain, attribute)][0]}">{escape(value)}</data>')
+    return ''.join(data)
+
+
+def write_graphml(view, f, progress=None):
+    """
+    Writes a GraphView in the GraphML format. The attribute keys must be declared before the graph, so the attributes
+    of all nodes and edges are read once before they are written.
+    """
+    keys = dict()
+    _graphml_keys(view.nodes(data=True), keys, 'node')
+    _graphml_keys(view.edges(data=True), keys, 'edge')
+    f.write("<?xml version='1.0' encoding='utf-8'?>\n"
+            '<graphml xmlns="http://graphml.graphdrawing.org/xmlns" '
+            'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+            'xsi:schemaLocation="http://graphml.graphdrawing.org/xmlns '
+            'http://graphml.graphdrawing.org/xmlns/1.0/graphml.xsd">\n')
+    for (domain, attribute), (key, kind) in keys.items():
+        f.write(f'  <key id="{key}" for="{domain}" attr.name={quoteattr(attribute)} attr.type="{kind}" />\n')
+    f.write(f'  <graph edgedefault="directed" id={quoteattr(view.name)}>\n')
+    for node, attributes in _counted(view.nodes(data=True), progress):
+        f.write(f'    <node id={quoteattr(node)}>{_graphml_data(attributes, keys, "node")}</node>\n')
+    written = view.number_of_nodes()
+    for u, v, attributes in _counted(view.edges(data=True), progress, written):
+        f.write(f'    <edge source={quoteattr(u)} target={quoteattr(v)}>{_graphml_data(attributes, keys, "edge")}'
+                '</edge>\n')
+    f.write('  </graph>\n</graphml>\n')
+# }}}
+
+
+# {{{ JSON and msgpack
+def _graph_records(view):
+    """
+    Yields the nodes of a GraphView as [name, attributes] and then its edges as [source, target] or [source, target,
+    attributes], where source and target are the positions of the nodes.
+    """
+    ids = dict()
+    for node, attributes in view.nodes(data=True):
+        ids[node] = len(ids)
+        yield 'node', [node, attributes]
+    for u, v, attributes in view.edges(data=True):
+        yield 'edge', [ids[u], ids[v], attributes] if attributes else [ids[u], ids[v]]
+
+
+_compact_json = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
+
+
+def write_json(view, f, progress=None):
+    """
+    Writes a GraphView as a compact JSON object with the 'name' of the graph, its 'nodes' as [name, attributes] and
+    its 'edges' as [source, target] pairs of node positions, followed by the edge attributes if there are any.
+    """
+    f.write(f'{{"version": {GRAPH_FORMAT_VERSION}, "name": {json.dumps(view.name)}, "directed": true, "nodes": [')
+    separator = '\n'
+    section = 'node'
+    for kind, record in _counted(_graph_records(view), progress):
+        if kind != section:
+            f.write('], "edges": [')
+            section, separator = kind, '\n'
+        f.write(separator + _compact_json(record))
+        separator = ',\n'
+    if section == 'node':
+        f.write('], "edges": [')
+    f.write(']}\n')
+
+
+def write_msgpack(view, f, progress=None):
+    """
+    Writes a GraphView in the structure of write_json encoded with msgpack. The number of edges is needed before they
+    are written, so the edges are counted first.
+    """
+    if msgpack is None:
+        raise ValueError("Invalid format 'msgpack', install msgpack to use it")
+    packer = msgpack.Packer()
+    f.write(packer.pack_map_header(5))
+    for key, value in (('version', GRAPH_FORMAT_VERSION), ('name', view.name), ('directed', True)):
+        f.write(packer.pack(key) + packer.pack(value))
+    f.write(packer.pack('nodes') + packer.pack_array_header(view.number_of_nodes()))
+    section = 'node'
+    for kind, record in _counted(_graph_records(view), progress):
+        if kind != section:
+            section = kind
+            f.write(packer.pack('edges') + packer.pack_array_header(sum(1 for _ in view.edges())))
+        f.write(packer.pack(record))
+    if section == 'node':
+        f.write(packer.pack('edges') + packer.pack_array_header(0))
+# }}}
+
+
+# {{{ HTML
+class _Placeholder(str):
+    """
+    Marker that stands for the nodes or edges in the pyvis template. Its length is the number of items, which the
+    template uses to decide whether to show a loading bar.
+    """
+
+    def __new__(cls, text: str, length: int):
+        placeholder = super().__new__(cls, text)
+        placeholder.length = length
+        return placeholder
+
+    def __len__(self):
+        return self.length
+
+
+def write_html(view, f, progress=None, positions: dict = None):
+    """
+    Writes a GraphView as a pyvis HTML page like Network.from_nx and Network.generate_html do. The template is rendered
+    with placeholders that are replaced by the nodes and edges while they are written.
+    """
+    network = Network(
+        height='80vh',
+        width='95vw',
+        neighborhood_highlight=True,
+        filter_menu=True,
+        cdn_resources='remote',
+    )
+    stream = NetworkStream(view, positions=positions).complete()
+    _, _, heading, height, width, options = network.get_network_data()
+    nodes = _Placeholder('@@vimwikigraph-nodes@@', len(stream.nodes))
+    edges = _Placeholder('@@vimwikigraph-edges@@', len(stream.edges))
+    html = network.templateEnv.get_template(network.path).render(
+        height=height, width=width, nodes=nodes, edges=edges, heading=heading, options=options,
+        physics_enabled=network.options.physics.enabled, use_DOT=False, dot_lang=None, widget=False,
+        bgcolor=network.bgcolor, conf=False, tooltip_link=False, neighborhood_highlight=True, select_menu=False,
+        filter_menu=True, notebook=False, cdn_resources='remote',
+    )
+    head, rest = html.split(json.dumps(str(nodes)), 1)
+    middle, tail = rest.split(json.dumps(str(edges)), 1)
+    f.write(head + '[')
+    items = _counted((vis_node(node, view.node_attributes(node), stream.positions.get(node)) for node in stream.nodes),
+                     progress)
+    for i, item in enumerate(items):
+        f.write((', ' if i else '') + json.dumps(item))
+    f.write(']' + middle + '[')
+    items = _counted((vis_edge(u, v, dict(attributes)) for u, v, attributes in stream.edges), progress, len(stream))
+    for i, item in enumerate(items):
+        f.write((', ' if i else '') + json.dumps(item))
+    f.write(']' + tail)
+# }}}
+
+
+# {{{ Export
+_WRITERS = {
+    'dot': write_dot,
+    'gml': write_gml,
+    'graphml': write_graphml,
+    'json': write_json,
+    'msgpack': write_msgpack,
+}
+
+
+def render_graphviz(dot_path: str, path: str, format: str, engine: str = 'dot', cancel: threading.Event = None):
+    """
+    Renders a DOT file with a Graphviz engine. The engine is killed if cancel is set while it runs.
+
+    Raises:
+        ExportCancelled: If cancel was set.
+        RuntimeError: If the engine is not installed or fails.
+    """
+    # Graphviz may print many warnings, so they go to a file rather than a pipe that could fill up.
+    with tempfile.TemporaryFile() as errors:
+        try:
+            process = subprocess.Popen([engine, f'-T{format}', '-o', path, dot_path], stdout=subprocess.DEVNULL,
+                                       stderr=errors)
+        except OSError as e:
+            raise RuntimeError(f"Cannot run Graphviz '{engine}': {e}")
+        try:
+            while process.poll() is None:
+                if cancel is None:
+                    process.wait()
+                elif cancel.wait(0.1):
+                    raise ExportCancelled()
+        finally:
+            if process.poll() is None:
+                process.kill()
+                process.wait()
+        if process.returncode:
+            errors.seek(0)
+            message = errors.read().decode(errors='replace').strip()
+            raise RuntimeError(f"Graphviz '{engine}' failed with status {process.returncode}: {message}")
+
+
+def export(view, path: str, format: str, positions: dict = None, progress=None, engine: str = 'dot',
+           cancel: threading.Event = None):
+    """
+    Writes a GraphView to path. The file is written under a temporary name and renamed when it is complete, so path
+    never holds a partial export.
+
+    Args:
+        view (GraphView): The graph to export. It must not change during the export.
+        path (str)
+        format (str): One of FORMATS, or one of GRAPHVIZ_FORMATS, which are rendered from DOT by Graphviz.
+        positions (dict): Maps nodes to fixed (x, y) positions in the HTML page.
+        progress: Called with ('write', number of nodes and edges written) and once with ('render', None) before
+            Graphviz runs.
+        engine (str): Graphviz layout engine, e.g. 'dot' or 'sfdp' for large graphs.
+        cancel (threading.Event): Stops the export with ExportCancelled when it is set.
+    """
+    check_format(format)
+
+    def report(written):
+        if cancel is not None and cancel.is_set():
+            raise ExportCancelled()
+        if progress is not None:
+            progress('write', written)
+
+    descriptor, partial = tempfile.mkstemp(prefix='.export-', dir=os.path.dirname(os.path.abspath(path)))
+    rendered = f'{partial}.{format}'
+    binary = format == 'msgpack'
+    try:
+        with open(descriptor, 'wb' if binary else 'w', encoding=None if binary else 'utf-8') as f:
+            if format == 'html':
+                write_html(view, f, report, positions)
+            else:
+                _WRITERS['dot' if format in GRAPHVIZ_FORMATS else format](view, f, report)
+        if format in GRAPHVIZ_FORMATS:
+            if progress is not None:
+                progress('render', None)
+            render_graphviz(partial, rendered, format, engine, cancel)
+            os.replace(rendered, path)
+        else:
+            os.replace(partial, path)
+    finally:
+        for leftover in (partial, rendered):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+# }}}
+
+
+# {{{ Background jobs
+class ExportCache:
+    """
+    Directory of finished exports named by a key of the graph version, the query and the format. At most max_entries
+    exports are kept, the least recently used are deleted first.
+    """
+
+    def __init__(self, directory: str = '', max_entries: int = 16):
+        """
+        Args:
+            directory (str): Directory of the exports. A temporary directory if empty.
+            max_entries (int): Maximum number of exports. 0 keeps all of them.
+        """
+        self.directory = directory or tempfile.mkdtemp(prefix='vimwikigraph-export-')
+        os.makedirs(self.directory, exist_ok=True)
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(*parts) -> str:
+        return hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+
+    def path(self, key: str, format: str) -> str:
+        return os.path.join(self.directory, f'{key}.{format}')
+
+    def get(self, key: str, format: str) -> str:
+        """
+        Returns the path of a finished export, or None.
+        """
+        path = self.path(key, format)
+        try:
+            os.utime(path)
+        except OSError:
+            return None
+        return path
+
+    def prune(self):
+        """
+        Deletes the least recently used exports beyond max_entries.
+        """
+        if not self.max_entries:
+            return
+        with self._lock:
+            entries = list()
+            for entry in os.scandir(self.directory):
+                if entry.is_file() and not entry.name.startswith('.'):
+                    entries.append((entry.stat().st_mtime, entry.path))
+            entries.sort(reverse=True)
+            for _, path in entries[self.max_entries:]:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+
+class ExportJob(threading.Thread):
+    """
+    Exports a GraphView into an ExportCache in a background thread. The status is 'running', 'rendering' while
+    Graphviz runs, 'done', 'failed' or 'cancelled'. Jobs whose export is already cached are 'done' without running.
+    """
+
+    def __init__(self, view, cache: ExportCache, key: str, format: str, positions: dict = None, engine: str = 'dot'):
+        """
+        Args:
+            view (GraphView): The graph to export. It must not change during the export.
+            cache (ExportCache)
+            key (str): Key of the export in cache.
+            format (str): One of FORMATS or GRAPHVIZ_FORMATS.
+            positions (dict): Maps nodes to fixed (x, y) positions in the HTML page.
+            engine (str): Graphviz layout engine.
+        """
+        super().__init__(name=f'vimwikigraph-export-{key[:8]}', daemon=True)
+        check_format(format)
+        self.view = view
+        self.cache = cache
+        self.key = key
+        self.format = format
+        self.positions = positions
+        self.engine = engine
+        self.path = cache.get(key, format)
+        self.status = 'done' if self.path else 'running'
+        self.error = None
+        self.written = 0
+        self.total = None
+        self.started = time.time()
+        self.finished = self.started if self.path else None
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        self._cancel.set()
+
+    @property
+    def progress(self) -> float:
+        """
+        The fraction of nodes and edges written. Graphviz does not report its progress, so it only reaches 1.0 once the
+        job is done.
+        """
+        if self.status == 'done':
+            return 1.0
+        if not self.total:
+            return 0.0
+        return min(self.written, self.total - 1) / self.total
+
+    def __progress(self, stage, written):
+        if stage == 'render':
+            self.status = 'rendering'
+        else:
+            self.written = written
+
+    def run(self):
+        if self.status != 'running':
+            return
+        try:
+            self.total = self.view.number_of_nodes() + self.view.number_of_edges()
+            path = self.cache.path(self.key, self.format)
+            export(self.view, path, self.format, self.positions, self.__progress, self.engine, self._cancel)
+            self.path = path
+            self.written = self.total
+            self.status = 'done'
+            self.cache.prune()
+        except ExportCancelled:
+            self.status = 'cancelled'
+        except Exception as e:
+            traceback.print_exc()
+            self.error = str(e)
+            self.status = 'failed'
+        finally:
+            self.finished = time.time()
+            # The view is not needed anymore and may be large.
+            self.view = None
+
+    def json(self) -> dict:
+        return {
+            'id': self.key,
+            'format': self.format,
+            'status': self.status,
+            'progress': self.progress,
+            'error': self.error,
+            'seconds': (self.finished or time.time()) - self.started,
+        }
+# }}}
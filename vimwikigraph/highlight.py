@@ -0,0 +1,77 @@
+import re
+from bisect import bisect_right
+
+from .patterns import compile_pattern
+
+
+HIGHLIGHT_START = '<span style="background:red">'
+HIGHLIGHT_END = '</span>'
+
+
+def highlight_spans(text: str, highlights) -> list:
+    """
+    Returns the (start, end) spans of text matched by any of the highlight regexes, ignoring case. The spans are sorted,
+    overlapping and adjacent matches are merged and empty matches are ignored.
+
+    Args:
+        text (str)
+        highlights: Regexes. Empty ones are ignored.
+
+    Raises:
+        InvalidPatternError: If a highlight is not a valid regular expression.
+    """
+    spans = list()
+    for highlight in highlights:
+        if highlight:
+            spans.extend(match.span() for match in compile_pattern(highlight, re.IGNORECASE).finditer(text)
+                         if match.end() > match.start())
+    spans.sort()
+    merged = list()
+    for start, end in spans:
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(end, merged[-1][1]))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def render(text: str, spans: list, start: int = 0, end: int = None) -> str:
+    """
+    Returns text[start:end] with the parts covered by spans wrapped in highlight tags.
+    """
+    end = len(text) if end is None else end
+    parts = list()
+    position = start
+    for span_start, span_end in spans[max(0, bisect_right(spans, (start,)) - 1):]:
+        if span_start >= end:
+            break
+        if span_end <= start:
+            continue
+        span_start, span_end = max(span_start, start), min(span_end, end)
+        parts.append(text[position:span_start])
+        parts.append(HIGHLIGHT_START + text[span_start:span_end] + HIGHLIGHT_END)
+        position = span_end
+    parts.append(text[position:end])
+    return ''.join(parts)
+
+
+def render_snippets(text: str, spans: list, window: int, separator: str = ' … ') -> str:
+    """
+    Returns the parts of text within window characters of the spans, with the spans wrapped in highlight tags.
+    Overlapping windows are merged and cut text is marked with separator. Without spans it returns the beginning of
+    the text.
+    """
+    if not spans:
+        end = min(len(text), 2 * window)
+        return text[:end] + (separator.rstrip() if end < len(text) else '')
+    windows = list()
+    for span_start, span_end in spans:
+        start, end = max(0, span_start - window), min(len(text), span_end + window)
+        if windows and start <= windows[-1][1]:
+            windows[-1] = (windows[-1][0], end)
+        else:
+            windows.append((start, end))
+    snippets = [render(text, spans, start, end) for start, end in windows]
+    prefix = separator.lstrip() if windows[0][0] > 0 else ''
+    suffix = separator.rstrip() if windows[-1][1] < len(text) else ''
+    return prefix + separator.join(snippets) + suffix
@@ -0,0 +1,192 @@
+import re
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+from .shared import SharedDict
+
+
+# Upper bound on the number of alternatives tracked while extracting literals from a regex.
+MAX_ALTERNATIVES = 64
+TOKEN_REGEX = re.compile(r'\w+')
+
+
+def _and(left, right):
+    """
+    Conjunction of two requirements in disjunctive normal form, i.e. lists of alternatives that are each a list of
+    literals that must all occur. None means that nothing is required.
+    """
+    if left is None:
+        return right
+    if right is None:
+        return left
+    combined = [a + b for a in left for b in right]
+    if len(combined) > MAX_ALTERNATIVES:
+        return left if len(left) <= len(right) else right
+    return combined
+
+
+def _or(alternatives):
+    if any(alternative is None for alternative in alternatives):
+        return None
+    combined = [a for alternative in alternatives for a in alternative]
+    if len(combined) > MAX_ALTERNATIVES:
+        return None
+    return combined
+
+
+def _requirements(parsed, ignorecase: bool):
+    """
+    Returns the literal strings that any match of the parsed regex must contain in disjunctive normal form.
+    """
+    requirement = None
+    run = []
+
+    def close_run():
+        nonlocal requirement
+        if run:
+            requirement = _and(requirement, [[''.join(run)]])
+            run.clear()
+
+    for op, arg in parsed:
+        if op is sre_parse.LITERAL and (not ignorecase or arg < 128):
+            run.append(chr(arg).lower() if ignorecase else chr(arg))
+            continue
+        close_run()
+        if op is sre_parse.SUBPATTERN:
+            group, add_flags, del_flags, pattern = arg
+            if not (add_flags | del_flags) & re.IGNORECASE:
+                requirement = _and(requirement, _requirements(pattern, ignorecase))
+        elif op is sre_parse.BRANCH:
+            requirement = _and(requirement, _or([_requirements(branch, ignorecase) for branch in arg[1]]))
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            min_repeat, max_repeat, pattern = arg
+            if min_repeat > 0:
+                requirement = _and(requirement, _requirements(pattern, ignorecase))
+    close_run()
+    return requirement
+
+
+def regex_requirements(regex: str):
+    """
+    Returns the literal strings that must occur in any text matched by regex as a list of alternatives, each of which
+    is a list of literals. Returns None if the regex can match without any literal or cannot be parsed.
+    """
+    try:
+        parsed = sre_parse.parse(regex)
+    except Exception:
+        return None
+    return _requirements(parsed, bool(parsed.state.flags & re.IGNORECASE))
+
+
+class ContentIndex:
+    """
+    Inverted index from the words of each document's lowercased text to the documents containing them, together with a
+    trigram index over the vocabulary. It narrows a regex down to the documents that contain every literal the regex
+    requires so that only those have to be searched. Candidates are a superset of the matching documents.
+    """
+
+    def __init__(self, documents=None):
+        """
+        Args:
+            documents (DocumentStore): Documents to index.
+        """
+        # Posting and trigram sets are shared with the index this one was copied from until they change.
+        self.postings = SharedDict()
+        self.vocabulary_trigrams = SharedDict()
+        self.documents = dict()
+        for name in documents or ():
+            self.update(name, documents.lower(name))
+
+    def copy(self) -> 'ContentIndex':
+        """
+        Returns a copy that shares all posting sets with this index until they are changed. Neither index may be
+        changed afterwards except through the copy.
+        """
+        index = ContentIndex()
+        index.postings = self.postings.copy()
+        index.vocabulary_trigrams = self.vocabulary_trigrams.copy()
+        index.documents = dict(self.documents)
+        return index
+
+    def __add_term(self, term):
+        for i in range(len(term) - 2):
+            self.vocabulary_trigrams.writable(term[i:i + 3], set).add(term)
+
+    def __remove_term(self, term):
+        for i in range(len(term) - 2):
+            trigram = term[i:i + 3]
+            if trigram in self.vocabulary_trigrams:
+                terms = self.vocabulary_trigrams.writable(trigram)
+                terms.discard(term)
+                if not terms:
+                    del self.vocabulary_trigrams[trigram]
+
+    def update(self, name: str, text: str):
+        """
+        Indexes or re-indexes a document given its lowercased text.
+        """
+        self.remove(name)
+        terms = frozenset(TOKEN_REGEX.findall(text))
+        self.documents[name] = terms
+        for term in terms:
+            if term not in self.postings:
+                self.__add_term(term)
+            self.postings.writable(term, set).add(name)
+
+    def remove(self, name: str):
+        for term in self.documents.pop(name, ()):
+            posting = self.postings.writable(term)
+            posting.discard(name)
+            if not posting:
+                del self.postings[term]
+                self.__remove_term(term)
+
+    def __terms_containing(self, segment):
+        terms = None
+        for i in range(len(segment) - 2):
+            trigram_terms = self.vocabulary_trigrams.get(segment[i:i + 3])
+            if not trigram_terms:
+                return []
+            terms = set(trigram_terms) if terms is None else terms & trigram_terms
+        return [term for term in terms if segment in term]
+
+    def __documents_containing(self, literal):
+        """
+        Returns the documents whose words contain every word segment of literal or None if literal has no segment of at
+        least three characters.
+        """
+        documents = None
+        for segment in TOKEN_REGEX.findall(literal):
+            if len(segment) < 3:
+                continue
+            segment_documents = set()
+            for term in self.__terms_containing(segment):
+                segment_documents.update(self.postings[term])
+            documents = segment_documents if documents is None else documents & segment_documents
+            if not documents:
+                break
+        return documents
+
+    def candidates(self, regex: str):
+        """
+        Returns the set of documents the lowercased text of which may match regex or None if every document may
+        match.
+        """
+        requirement = regex_requirements(regex)
+        if requirement is None:
+            return None
+        candidates = set()
+        for alternative in requirement:
+            documents = None
+            for literal in alternative:
+                literal_documents = self.__documents_containing(literal)
+                if literal_documents is None:
+                    continue
+                documents = literal_documents if documents is None else documents & literal_documents
+            if documents is None:
+                return None
+            candidates |= documents
+        return candidates
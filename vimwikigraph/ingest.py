@@ -0,0 +1,154 @@
+import functools
+import hashlib
+import os
+import posixpath
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+# Links do not span lines, so the whole text of a file is scanned at once.
+LINK_REGEX = r'\[\[([^#|\[\]\n]+)(#[^|\[\]\n]*)?(\|[^\]\n]*)?\]\]'
+TAG_REGEX = r'^:((\w+:)+)'
+URL_REGEX = r'https?:/+([^/]*)'
+
+# Attributes of all links without anchor, description or host. Shared, so it must never be changed.
+NO_ATTRIBUTES = dict()
+
+_link_pattern = re.compile(LINK_REGEX)
+_url_pattern = re.compile(URL_REGEX)
+
+
+@functools.lru_cache(maxsize=1 << 17)
+def normalize_path(root: str, link: str) -> str:
+    """
+    Returns the interned node of a link in a file in the directory root: the host of a URL, the file name of a file
+    link or the path of a wiki file. The results are cached, as the same links appear in many files.
+    """
+    if link.startswith(('http://', 'https://')):
+        return sys.intern(_url_pattern.match(link).group(1))
+    if link.startswith('file:/'):
+        return sys.intern(link.rsplit('/', 1)[-1])
+    if ':' in link:
+        link = link.replace(':', '')
+    if '.' in link or '//' in link:
+        link = posixpath.normpath(link)
+        # Parent directories are resolved against root without normalizing it, so targets match the scanned names.
+        while link == '..' or link.startswith('../'):
+            root, link = os.path.dirname(root.rstrip('/')), link[3:]
+    path = os.path.join(root, link)
+    if not path.endswith(".wiki"):
+        path += ".wiki"
+    return sys.intern(path)
+
+
+def read_file(name: str):
+    """
+    Reads a file and returns its (mtime, size, hash) stats together with its text with normalized newlines.
+    """
+    stat = os.stat(name)
+    with open(name, 'rb') as f:
+        data = f.read()
+    digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+    text = data.decode().replace('\r\n', '\n').replace('\r', '\n')
+    return (stat.st_mtime_ns, stat.st_size, digest), text
+
+
+def parse_links(root: str, text: str) -> dict:
+    """
+    Returns the normalized targets of all links in text in order of first occurrence, mapped to the attributes of
+    their first link: its 'anchor' and 'description' and the 'host' of a URL, where present.
+    """
+    links = dict()
+    if '[[' not in text:
+        return links
+    for link, anchor, description in _link_pattern.findall(text):
+        target = normalize_path(root, link)
+        if target in links:
+            continue
+        external = link.startswith(('http://', 'https://'))
+        if len(anchor) < 2 and len(description) < 2 and not external:
+            links[target] = NO_ATTRIBUTES
+            continue
+        attributes = dict()
+        if len(anchor) > 1:
+            attributes['anchor'] = anchor[1:]
+        if len(description) > 1:
+            attributes['description'] = description[1:]
+        if external:
+            attributes['host'] = target
+        links[target] = attributes
+    return links
+
+
+def intern_links(links: dict) -> dict:
+    """
+    Returns links with interned targets, e.g. after they were unpickled.
+    """
+    return dict(zip(map(sys.intern, links), links.values()))
+
+
+def parse_tags(text: str) -> dict:
+    """
+    Returns the vimwiki tags of text, i.e. the words of lines of the form :tag1:tag2:, mapped to their number of
+    occurrences in order of first occurrence.
+    """
+    tags = dict()
+    for match in re.finditer(TAG_REGEX, text, re.MULTILINE):
+        for tag in match.group(1).split(':'):
+            if tag:
+                tags[tag] = tags.get(tag, 0) + 1
+    return tags
+
+
+def parse_file(name: str, root: str):
+    """
+    Reads and parses a single file. This is the unit of work of ingest and must stay picklable.
+
+    Returns:
+        tuple: (name, stats, text, links, tags) where links maps link targets to edge attributes.
+    """
+    stats, text = read_file(name)
+    return name, stats, text, parse_links(root, text), parse_tags(text)
+
+
+def _parse_file(item):
+    return parse_file(*item)
+
+
+def ingest(node_dict: dict, workers: int = 1, executor: str = 'thread'):
+    """
+    Reads and parses files in parallel and yields their parse_file results in the order of node_dict.
+
+    Args:
+        node_dict (dict): Maps file names to the directory their relative links are resolved against.
+        workers (int): Number of workers. 1 parses in the calling thread, 0 uses one worker per CPU.
+        executor (str): 'thread' or 'process'. Link extraction is CPU bound so only a process pool scales beyond
+            the I/O.
+    """
+    try:
+        yield from _ingest(list(node_dict.items()), workers, executor)
+    finally:
+        # Links are memoized for one run only, as the cache entries would otherwise slow down every garbage
+        # collection of the process.
+        normalize_path.cache_clear()
+
+
+def _ingest(items: list, workers: int, executor: str):
+    if not workers:
+        workers = os.cpu_count() or 1
+    if workers == 1 or len(items) < 2:
+        yield from map(_parse_file, items)
+        return
+    if executor == 'process':
+        pool = ProcessPoolExecutor(max_workers=workers)
+        chunksize = max(1, len(items) // (workers * 4))
+    elif executor == 'thread':
+        pool = ThreadPoolExecutor(max_workers=workers)
+        chunksize = 1
+    else:
+        raise ValueError(f"Invalid executor '{executor}', expected 'thread' or 'process'")
+    with pool:
+        for name, stats, text, links, tags in pool.map(_parse_file, items, chunksize=chunksize):
+            # Strings of other processes arrive as copies.
+            yield sys.intern(name), stats, text, intern_links(links) if executor == 'process' else links, tags
@@ -0,0 +1,107 @@
+import numpy as np
+
+from .view import GraphView
+
+
+def force_layout(n: int, sources: np.ndarray, targets: np.ndarray, positions: np.ndarray = None,
+                 movable: np.ndarray = None, iterations: int = 50, length: float = 100.0, samples: int = 8,
+                 seed: int = 0) -> np.ndarray:
+    """
+    Fruchterman-Reingold force directed layout. Edges attract their nodes and every node is repelled by a random
+    sample of the other nodes in each iteration instead of all of them, which makes an iteration linear in the size of
+    the graph, or in the number of movable nodes and their edges if only some nodes may move.
+
+    Args:
+        n (int): Number of nodes.
+        sources (np.ndarray): Source node of every edge.
+        targets (np.ndarray): Target node of every edge.
+        positions (np.ndarray): Initial positions as an (n, 2) array. Random if None.
+        movable (np.ndarray): Boolean mask of the nodes that may move. All nodes if None.
+        iterations (int): Number of iterations.
+        length (float): Ideal edge length.
+        samples (int): Number of nodes that repel each node per iteration.
+        seed (int): Seed of the initial positions and the sampling.
+
+    Returns:
+        np.ndarray: The positions as an (n, 2) array.
+    """
+    rng = np.random.default_rng(seed)
+    side = length * np.sqrt(max(n, 1))
+    positions = rng.random((n, 2)) * side if positions is None else np.array(positions, dtype=float)
+    moving = np.arange(n) if movable is None else np.flatnonzero(movable)
+    if n < 2 or not len(moving):
+        return positions
+    if movable is not None:
+        # Only the edges of moving nodes move anything, so an iteration takes time linear in their number of edges.
+        incident = movable[sources] | movable[targets]
+        sources, targets = sources[incident], targets[incident]
+    start = side / 10
+    for iteration in range(iterations):
+        temperature = start * (1 - iteration / iterations)
+        displacement = np.zeros((n, 2))
+        others = rng.integers(0, n, (len(moving), samples))
+        delta = positions[moving, None, :] - positions[others]
+        distance2 = np.einsum('ijk,ijk->ij', delta, delta) + 1e-9
+        displacement[moving] = (delta * (length ** 2 / distance2)[..., None]).sum(1) * (n / samples)
+        delta = positions[targets] - positions[sources]
+        force = delta * (np.sqrt(np.einsum('ij,ij->i', delta, delta)) / length)[:, None]
+        for axis in (0, 1):
+            displacement[:, axis] += np.bincount(sources, force[:, axis], minlength=n)
+            displacement[:, axis] -= np.bincount(targets, force[:, axis], minlength=n)
+        step = np.sqrt(np.einsum('ij,ij->i', displacement[moving], displacement[moving])) + 1e-9
+        positions[moving] += displacement[moving] * (np.minimum(step, temperature) / step)[:, None]
+    return positions
+
+
+def layout_graph(graph, previous: dict = None, changed=(), iterations: int = 50, seed: int = 0) -> dict:
+    """
+    Lays out a link graph. With previous positions only the new nodes and the changed nodes move, so the layout of
+    the rest of the graph stays stable. New nodes start at the center of their placed neighbors.
+
+    Args:
+        graph (nx.DiGraph or CSRGraph): The link graph.
+        previous (dict): Maps nodes to their previous (x, y) positions.
+        changed: Nodes whose links changed since previous.
+        iterations (int): Number of iterations.
+        seed (int): Seed of the random positions.
+
+    Returns:
+        dict: Maps every node of graph to its (x, y) position.
+    """
+    nodes = list(graph)
+    n = len(nodes)
+    placed = np.fromiter((node in previous for node in nodes), dtype=bool, count=n) if previous else np.zeros(n, bool)
+    if not placed.any():
+        nodes, sources, targets = GraphView(graph).adjacency()
+        positions = force_layout(n, sources, targets, iterations=iterations, seed=seed)
+        return dict(zip(nodes, map(tuple, positions.tolist())))
+    rng = np.random.default_rng(seed)
+    index = {node: i for i, node in enumerate(nodes)}
+    movable = ~placed
+    movable[[index[node] for node in changed if node in index]] = True
+    if not movable.any():
+        return dict(zip(nodes, map(previous.get, nodes)))
+    # Only the edges of movable nodes place or move anything, so the others are not collected.
+    moving = [nodes[i] for i in np.flatnonzero(movable).tolist()]
+    edges = dict()
+    for node in moving:
+        edges.update(dict.fromkeys((node, successor) for successor in graph.successors(node)))
+        edges.update(dict.fromkeys((predecessor, node) for predecessor in graph.predecessors(node)))
+    edges = np.array([(index[u], index[v]) for u, v in edges], dtype=np.int64).reshape(-1, 2)
+    sources, targets = edges[:, 0], edges[:, 1]
+    positions = np.array([previous.get(node, (0.0, 0.0)) for node in nodes], dtype=float)
+    # Start new nodes at the mean position of their placed neighbors or at a random position if they have none.
+    ends = np.concatenate([sources, targets])
+    neighbors = np.concatenate([targets, sources])
+    known = placed[neighbors]
+    count = np.bincount(ends[known], minlength=n)
+    low, high = positions[placed].min(0), positions[placed].max(0)
+    for axis in (0, 1):
+        total = np.bincount(ends[known], positions[neighbors[known], axis], minlength=n)
+        start = np.where(count > 0, total / np.maximum(count, 1), rng.uniform(low[axis], high[axis], n))
+        positions[~placed, axis] = start[~placed] + rng.normal(0, 10, (~placed).sum())
+    positions = force_layout(n, sources, targets, positions, movable, iterations=iterations, seed=seed)
+    # Nodes that did not move keep their previous position tuples.
+    layout = dict(zip(nodes, map(previous.get, nodes)))
+    layout.update(zip(moving, map(tuple, positions[movable].tolist())))
+    return layout
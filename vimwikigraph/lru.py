@@ -0,0 +1,66 @@
+import threading
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Thread-safe least recently used cache bounded by the number of entries and, optionally, by the total size of the
+    values as measured by 'sizeof'.
+    """
+
+    def __init__(self, max_entries: int = 128, max_size: int = 0, sizeof=len):
+        """
+        Args:
+            max_entries (int): Maximum number of entries. 0 disables the cache.
+            max_size (int): Maximum total size of all values. 0 means unbounded.
+            sizeof: Function that returns the size of a value.
+        """
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.sizeof = sizeof
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key][0]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        size = self.sizeof(value) if self.max_size else 0
+        if not self.max_entries or (self.max_size and size > self.max_size):
+            return value
+        with self._lock:
+            if key in self._entries:
+                self.size -= self._entries.pop(key)[1]
+            self._entries[key] = (value, size)
+            self.size += size
+            while len(self._entries) > self.max_entries or (self.max_size and self.size > self.max_size):
+                self.size -= self._entries.popitem(last=False)[1][1]
+        return value
+
+    def pop(self, key, default=None):
+        """
+        Removes key and returns its value, or default if it is not cached.
+        """
+        with self._lock:
+            if key not in self._entries:
+                return default
+            value, size = self._entries.pop(key)
+            self.size -= size
+            return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
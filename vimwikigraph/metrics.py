@@ -0,0 +1,170 @@
+import threading
+import time
+
+
+class _Stage:
+    """
+    Context manager that times a stage and, given a GraphView, records its node and edge counts before and after.
+    """
+
+    __slots__ = ('metrics', 'name', 'view', 'start')
+
+    def __init__(self, metrics: 'Metrics', name: str, view=None):
+        self.metrics = metrics
+        self.name = name
+        self.view = view
+
+    def __enter__(self):
+        if self.view is not None:
+            self.metrics.record_counts(self.name, 'before', self.view)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+        if self.view is not None:
+            self.metrics.record_counts(self.name, 'after', self.view)
+        return False
+
+
+class _NoStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NO_STAGE = _NoStage()
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Metrics:
+    """
+    Opt-in registry of stage durations, node and edge counts and cache statistics that renders them in the Prometheus
+    text format. While disabled, stage() returns a shared no-op context manager, so instrumented code costs almost
+    nothing. The stages of the current thread can also be collected per request, e.g. for a Server-Timing header.
+    """
+
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.durations = dict()
+        self.counts = dict()
+        self.requests = dict()
+        self.caches = dict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def stage(self, name: str, view=None):
+        """
+        Returns a context manager that times the stage name.
+
+        Args:
+            name (str): Name of the stage.
+            view (GraphView): If given, its node and edge counts before and after the stage are recorded. The view keeps
+                its edge count until it changes, so the count before a stage reuses the one after the previous stage.
+                Counting is not included in the duration.
+        """
+        if not self.enabled:
+            return _NO_STAGE
+        return _Stage(self, name, view)
+
+    def observe(self, name: str, seconds: float):
+        with self._lock:
+            total, count = self.durations.get(name, (0.0, 0))
+            self.durations[name] = (total + seconds, count + 1)
+        timings = getattr(self._local, 'timings', None)
+        if timings is not None:
+            timings.append((name, seconds))
+
+    def record_counts(self, name: str, when: str, view):
+        nodes = view.number_of_nodes()
+        edges = view.number_of_edges()
+        with self._lock:
+            self.counts[(name, when)] = (nodes, edges)
+
+    def observe_request(self, endpoint: str, seconds: float):
+        with self._lock:
+            total, count = self.requests.get(endpoint, (0.0, 0))
+            self.requests[endpoint] = (total + seconds, count + 1)
+
+    def add_cache(self, name: str, cache):
+        """
+        Registers an LRUCache whose hits, misses and size are rendered with the metrics.
+        """
+        self.caches[name] = cache
+
+    def start_request(self):
+        """
+        Starts collecting the stages of the current thread.
+        """
+        self._local.timings = list()
+
+    def end_request(self) -> list:
+        """
+        Stops collecting and returns the (stage, seconds) pairs of the current thread since start_request.
+        """
+        timings = getattr(self._local, 'timings', None) or list()
+        self._local.timings = None
+        return timings
+
+    def clear(self):
+        with self._lock:
+            self.durations.clear()
+            self.counts.clear()
+            self.requests.clear()
+
+    def render(self, gauges: dict = None) -> str:
+        """
+        Returns the metrics in the Prometheus text exposition format.
+
+        Args:
+            gauges (dict): Additional gauges as name -> (help, value).
+        """
+        lines = list()
+
+        def family(name, kind, help):
+            lines.append(f'# HELP {name} {help}')
+            lines.append(f'# TYPE {name} {kind}')
+
+        with self._lock:
+            durations = dict(self.durations)
+            counts = dict(self.counts)
+            requests = dict(self.requests)
+        family('vimwikigraph_stage_seconds', 'summary', 'Duration of graph operations and serialization.')
+        for name, (total, count) in sorted(durations.items()):
+            lines.append(f'vimwikigraph_stage_seconds_sum{{stage="{_escape(name)}"}} {total}')
+            lines.append(f'vimwikigraph_stage_seconds_count{{stage="{_escape(name)}"}} {count}')
+        family('vimwikigraph_request_seconds', 'summary', 'Duration of requests by endpoint.')
+        for endpoint, (total, count) in sorted(requests.items()):
+            lines.append(f'vimwikigraph_request_seconds_sum{{endpoint="{_escape(endpoint)}"}} {total}')
+            lines.append(f'vimwikigraph_request_seconds_count{{endpoint="{_escape(endpoint)}"}} {count}')
+        for index, metric in enumerate(('nodes', 'edges')):
+            family(f'vimwikigraph_stage_{metric}', 'gauge',
+                   f'Number of visible {metric} before and after the last run of a stage.')
+            for (name, when), values in sorted(counts.items()):
+                lines.append(f'vimwikigraph_stage_{metric}{{stage="{_escape(name)}",when="{when}"}} {values[index]}')
+        for metric, kind, help in (('hits', 'counter', 'Cache hits.'), ('misses', 'counter', 'Cache misses.'),
+                                   ('entries', 'gauge', 'Cached entries.')):
+            name = f'vimwikigraph_cache_{metric}' + ('_total' if kind == 'counter' else '')
+            family(name, kind, help)
+            for cache_name, cache in sorted(self.caches.items()):
+                value = len(cache) if metric == 'entries' else getattr(cache, metric)
+                lines.append(f'{name}{{cache="{_escape(cache_name)}"}} {value}')
+        family('vimwikigraph_cache_hit_ratio', 'gauge', 'Fraction of cache lookups that were hits.')
+        for cache_name, cache in sorted(self.caches.items()):
+            lookups = cache.hits + cache.misses
+            lines.append(f'vimwikigraph_cache_hit_ratio{{cache="{_escape(cache_name)}"}} '
+                         f'{cache.hits / lookups if lookups else 0.0}')
+        for name, (help, value) in (gauges or dict()).items():
+            family(name, 'gauge', help)
+            lines.append(f'{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = Metrics()
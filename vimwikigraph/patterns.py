@@ -0,0 +1,30 @@
+import functools
+import re
+
+
+class InvalidPatternError(ValueError):
+    """
+    Raised when a filter, highlight or label pattern is not a valid regular expression.
+    """
+
+    def __init__(self, pattern: str, error: re.error):
+        super().__init__(f"Invalid regular expression '{pattern}': {error}")
+        self.pattern = pattern
+
+
+@functools.lru_cache(maxsize=256)
+def compile_pattern(pattern: str, flags: int = 0) -> re.Pattern:
+    """
+    Compiles pattern and keeps the 256 most recently used patterns.
+
+    Raises:
+        InvalidPatternError: If pattern is not a valid regular expression.
+    """
+    try:
+        return re.compile(pattern, flags)
+    except re.error as e:
+        raise InvalidPatternError(pattern, e) from e
+
+
+def compile_patterns(patterns: list, flags: int = re.MULTILINE) -> list:
+    return [compile_pattern(pattern, flags) for pattern in patterns]
@@ -0,0 +1,98 @@
+from .metrics import metrics
+from .snapshot import GraphSnapshot
+from .vimwikigraph import VimwikiGraph
+
+
+class GraphQuery:
+    """
+    Immutable pipeline of VimwikiGraph operations. Every method returns a new query with one more step, so a query can
+    be shared between threads and reused. run() applies the steps to a private view of a snapshot, which makes it safe
+    to run queries concurrently against the same snapshot.
+
+    Example:
+        query = GraphQuery().filter_nodes(['todo']).add_attribute_by_regex(['urgent'], ['color'], ['red'])
+        graph = query.run(vimwikigraph.snapshot).graph
+    """
+
+    def __init__(self, steps: tuple = ()):
+        self._steps = tuple(steps)
+
+    def __add_step(self, operation: str, *args) -> 'GraphQuery':
+        return GraphQuery(self._steps + ((operation, args),))
+
+    @property
+    def steps(self) -> tuple:
+        """
+        The steps as a hashable tuple of (operation, arguments) pairs.
+        """
+        return self._steps
+
+    def __eq__(self, other):
+        return isinstance(other, GraphQuery) and self._steps == other._steps
+
+    def __hash__(self):
+        return hash(self._steps)
+
+    def __repr__(self):
+        return f"GraphQuery({self._steps!r})"
+
+    # Steps whose first argument is a conjunction of regexes or tags, i.e. whose result does not depend on the order of
+    # the regexes or on duplicates.
+    _CONJUNCTIONS = {'filter_filenames', 'filter_nodes', 'filter_tags', 'add_attribute_by_regex'}
+
+    def normalized(self) -> 'GraphQuery':
+        """
+        Returns an equivalent query in canonical form, so that queries that differ only in the order or repetition of
+        their regexes compare equal.
+        """
+        steps = list()
+        for operation, args in self._steps:
+            if operation in self._CONJUNCTIONS:
+                args = (tuple(sorted(set(args[0]))),) + args[1:]
+            steps.append((operation, args))
+        return GraphQuery(steps)
+
+    # {{{ Steps
+    def filter_filenames(self, regexes: list, invert: bool = False) -> 'GraphQuery':
+        return self.__add_step('filter_filenames', tuple(regexes), bool(invert))
+
+    def filter_nodes(self, regexes: list, invert: bool = False) -> 'GraphQuery':
+        return self.__add_step('filter_nodes', tuple(regexes), bool(invert))
+
+    def filter_tags(self, tags: list, invert: bool = False) -> 'GraphQuery':
+        return self.__add_step('filter_tags', tuple(tags), bool(invert))
+
+    def collapse_children(self, nodes: list, depth: int = 1) -> 'GraphQuery':
+        return self.__add_step('collapse_children', tuple(nodes), int(depth))
+
+    def add_attribute_by_regex(self, regexes: list, attribute: list, value: list) -> 'GraphQuery':
+        return self.__add_step('add_attribute_by_regex', tuple(regexes), tuple(attribute), tuple(value))
+
+    def weight_attribute(self, attribute: str = 'fontsize', min_val: int = 20, max_val: int = 100,
+                         metric: str = 'betweenness', k: int = None, seed: int = 0) -> 'GraphQuery':
+        return self.__add_step('weight_attribute', attribute, min_val, max_val, metric, k, seed)
+
+    def extend_node_label(self, regexes: list, join_str: str = '\n') -> 'GraphQuery':
+        return self.__add_step('extend_node_label', tuple(regexes), join_str)
+
+    def remove_nonadjacent_nodes(self, node: str, depth: int = 1, direction: str = 'both',
+                                 limit: int = None) -> 'GraphQuery':
+        return self.__add_step('remove_nonadjacent_nodes', node, int(depth), direction,
+                               None if limit is None else int(limit))
+
+    def filter_search(self, query: str, k: int = 10, depth: int = 0, boost: float = 0.0) -> 'GraphQuery':
+        return self.__add_step('filter_search', query, int(k), int(depth), float(boost))
+    # }}}
+
+    def run(self, snapshot: GraphSnapshot) -> VimwikiGraph:
+        """
+        Applies the steps to a new view of snapshot.
+
+        Returns:
+            VimwikiGraph: A VimwikiGraph of snapshot whose graph is the result of the query.
+        """
+        vimwikigraph = VimwikiGraph.from_snapshot(snapshot)
+        for operation, args in self._steps:
+            with metrics.stage(operation, vimwikigraph.view):
+                getattr(vimwikigraph, operation)(*args)
+        return vimwikigraph
@@ -0,0 +1,334 @@
+import heapq
+import math
+import re
+import shlex
+from bisect import bisect_left
+from collections import Counter
+
+import numpy as np
+
+from .index import TOKEN_REGEX
+from .shared import SharedDict
+
+
+# Maximum number of vocabulary terms a prefix query expands to. The terms in the most documents are kept.
+MAX_EXPANSIONS = 64
+
+
+class SearchQuery:
+    """
+    Parsed search query. Words are matched as terms, 'word*' as a prefix, "quoted words" as a phrase and '-word'
+    excludes the documents that contain the word. Documents are ranked by the sum of the BM25 scores of the terms and
+    phrases they match.
+    """
+
+    def __init__(self, text: str):
+        self.terms = list()
+        self.prefixes = list()
+        self.phrases = list()
+        self.excluded = list()
+        try:
+            parts = shlex.split(text)
+        except ValueError:
+            parts = text.replace('"', ' ').split()
+        for part in parts:
+            tokens = TOKEN_REGEX.findall(part.lower())
+            if not tokens:
+                continue
+            if part.startswith('-') and len(tokens) == 1:
+                self.excluded.append(tokens[0])
+            elif len(tokens) > 1:
+                self.phrases.append(tokens)
+            elif part.endswith('*'):
+                self.prefixes.append(tokens[0])
+            else:
+                self.terms.append(tokens[0])
+
+    def __bool__(self):
+        return bool(self.terms or self.prefixes or self.phrases)
+
+    def highlights(self) -> list:
+        """
+        Returns regexes that match the terms, prefixes and phrases of the query in the original text.
+        """
+        highlights = [rf'\b{re.escape(term)}\b' for term in self.terms]
+        highlights.extend(rf'\b{re.escape(prefix)}\w*' for prefix in self.prefixes)
+        highlights.extend(phrase_regex(phrase) for phrase in self.phrases)
+        return highlights
+
+
+def phrase_regex(tokens: list) -> str:
+    return r'\b' + r'\W+'.join(map(re.escape, tokens)) + r'\b'
+
+
+class SearchIndex:
+    """
+    Full-text index with BM25 ranking over the lowercased words of the documents. The postings of most documents are
+    kept in compact per-term arrays of document ids and term frequencies that are never changed. Documents that are
+    added or changed later go into a small delta of dicts, their previous postings are masked out by their ids, and
+    the delta is merged into new arrays once it grows beyond a fraction of the index. Phrases are verified against the
+    text of the best scoring candidates only, so no word positions are stored.
+    """
+
+    K1 = 1.2
+    B = 0.75
+    # The delta is merged when it holds more than this fraction of the documents and at least MIN_MERGE documents.
+    MERGE_FRACTION = 0.1
+    MIN_MERGE = 1000
+
+    def __init__(self, documents=None):
+        """
+        Args:
+            documents (DocumentStore): Documents to index.
+        """
+        self.names = list()
+        self.ids = dict()
+        self.lengths = list()
+        self.total_length = 0
+        self.base = dict()
+        # Delta postings are shared with the index this one was copied from until they change, like the vocabulary
+        # until _owned_vocabulary is set.
+        self.delta = SharedDict()
+        self.delta_documents = 0
+        self.vocabulary = list()
+        self._arrays = None
+        self._boost = None
+        self._owned_vocabulary = True
+        if documents is not None:
+            self.__build(documents)
+
+    def __build(self, documents):
+        postings = dict()
+        for name in documents:
+            doc, counts = self.__add_document(name, documents.lower(name))
+            for term, frequency in counts.items():
+                entry = postings.get(term)
+                if entry is None:
+                    entry = postings[term] = (list(), list())
+                entry[0].append(doc)
+                entry[1].append(frequency)
+        self.base = {term: (np.array(ids, dtype=np.int32), np.array(frequencies, dtype=np.int32))
+                     for term, (ids, frequencies) in postings.items()}
+        self.vocabulary = sorted(self.base)
+
+    def __add_document(self, name: str, text: str) -> tuple:
+        """
+        Assigns a new id to a document and returns it with the term frequencies of text.
+        """
+        tokens = TOKEN_REGEX.findall(text)
+        doc = len(self.names)
+        self.names.append(name)
+        self.ids[name] = doc
+        self.lengths.append(len(tokens))
+        self.total_length += len(tokens)
+        self._arrays = None
+        self._boost = None
+        return doc, Counter(tokens)
+
+    def copy(self) -> 'SearchIndex':
+        """
+        Returns a copy that shares the postings with this index until they are changed. Neither index may be changed
+        afterwards except through the copy.
+        """
+        index = SearchIndex()
+        index.names = list(self.names)
+        index.ids = dict(self.ids)
+        index.lengths = list(self.lengths)
+        index.total_length = self.total_length
+        index.base = self.base
+        index.delta = self.delta.copy()
+        index.delta_documents = self.delta_documents
+        index.vocabulary = self.vocabulary
+        index._owned_vocabulary = False
+        return index
+
+    def __delta_posting(self, term) -> dict:
+        if term not in self.delta and term not in self.base:
+            if not self._owned_vocabulary:
+                self.vocabulary = list(self.vocabulary)
+                self._owned_vocabulary = True
+            position = bisect_left(self.vocabulary, term)
+            if position == len(self.vocabulary) or self.vocabulary[position] != term:
+                self.vocabulary.insert(position, term)
+        return self.delta.writable(term, dict)
+
+    def update(self, name: str, text: str):
+        """
+        Indexes or re-indexes a document given its lowercased text.
+        """
+        self.remove(name)
+        doc, counts = self.__add_document(name, text)
+        for term, frequency in counts.items():
+            self.__delta_posting(term)[doc] = frequency
+        self.delta_documents += 1
+        if self.delta_documents > max(self.MIN_MERGE, self.MERGE_FRACTION * len(self.ids)):
+            self.__merge()
+
+    def remove(self, name: str):
+        doc = self.ids.pop(name, None)
+        if doc is None:
+            return
+        self.names[doc] = None
+        self.total_length -= self.lengths[doc]
+        self._arrays = None
+        self._boost = None
+
+    def __merge(self):
+        """
+        Merges the delta into new base arrays and renumbers the documents without gaps.
+        """
+        alive, _ = self.__live()
+        remap = np.cumsum(alive, dtype=np.int64) - 1
+        base = dict()
+        for term in set(self.base).union(self.delta):
+            ids, frequencies = self.__postings(term, alive)
+            if len(ids):
+                base[term] = (remap[ids].astype(np.int32), frequencies)
+        self.names = [name for name in self.names if name is not None]
+        self.ids = {name: doc for doc, name in enumerate(self.names)}
+        self.lengths = [length for length, keep in zip(self.lengths, alive.tolist()) if keep]
+        self.base = base
+        self.delta = SharedDict()
+        self.delta_documents = 0
+        self.vocabulary = sorted(base)
+        self._owned_vocabulary = True
+        self._arrays = None
+        self._boost = None
+
+    # {{{ Queries
+    def __live(self):
+        """
+        Returns the mask of the ids of live documents and the array of document lengths.
+        """
+        if self._arrays is None:
+            self._arrays = (np.array([name is not None for name in self.names], dtype=bool),
+                            np.array(self.lengths, dtype=np.float64))
+        return self._arrays
+
+    def __postings(self, term: str, alive: np.ndarray):
+        """
+        Returns the ids of the live documents that contain term and the frequencies of term in them.
+        """
+        ids, frequencies = self.base.get(term, (np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.int32)))
+        delta = self.delta.get(term)
+        if delta:
+            ids = np.concatenate([ids, np.fromiter(delta.keys(), dtype=np.int32, count=len(delta))])
+            frequencies = np.concatenate([frequencies, np.fromiter(delta.values(), dtype=np.int32, count=len(delta))])
+        keep = alive[ids]
+        return ids[keep], frequencies[keep]
+
+    def __bm25(self, term: str):
+        """
+        Returns the ids of the live documents that contain term and the BM25 scores of term in them.
+        """
+        alive, lengths = self.__live()
+        ids, frequencies = self.__postings(term, alive)
+        n = len(self.ids)
+        if not len(ids) or not n:
+            return ids, np.zeros(0)
+        idf = math.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+        average = self.total_length / n or 1
+        norm = self.K1 * (1 - self.B + self.B * lengths[ids] / average)
+        return ids, idf * frequencies * (self.K1 + 1) / (frequencies + norm)
+
+    def expand(self, prefix: str) -> list:
+        """
+        Returns the terms of the vocabulary that start with prefix, at most MAX_EXPANSIONS of them.
+        """
+        terms = list()
+        for position in range(bisect_left(self.vocabulary, prefix), len(self.vocabulary)):
+            term = self.vocabulary[position]
+            if not term.startswith(prefix):
+                break
+            terms.append(term)
+        if len(terms) > MAX_EXPANSIONS:
+            # The counts include removed documents, which is close enough to choose the expansions.
+            terms.sort(key=lambda term: len(self.base.get(term, ((),))[0]) + len(self.delta.get(term, ())),
+                       reverse=True)
+            terms = terms[:MAX_EXPANSIONS]
+        return terms
+
+    def search(self, query, documents, k: int = 10, boost: np.ndarray = None) -> tuple:
+        """
+        Returns the k best matching documents of a query.
+
+        Args:
+            query (SearchQuery or str)
+            documents (DocumentStore): The indexed documents. Phrases are verified against their lowercased text.
+            k (int): Number of results.
+            boost (np.ndarray): Factors by document id that multiply the scores, e.g. from boost_vector.
+
+        Returns:
+            tuple: The list of (name, score) pairs in descending order of score and the number of documents that
+            matched the terms before phrases were verified.
+        """
+        if not isinstance(query, SearchQuery):
+            query = SearchQuery(query)
+        size = len(self.names)
+        scores = np.zeros(size)
+        for term in query.terms + [term for prefix in query.prefixes for term in self.expand(prefix)]:
+            ids, values = self.__bm25(term)
+            scores += np.bincount(ids, values, minlength=size)
+        # Phrase scores are upper bounds until the phrase is found in the text of a document.
+        phrases = list()
+        for tokens in query.phrases:
+            candidates = None
+            phrase_scores = np.zeros(size)
+            for token in tokens:
+                ids, values = self.__bm25(token)
+                phrase_scores += np.bincount(ids, values, minlength=size)
+                candidates = ids if candidates is None else np.intersect1d(candidates, ids, assume_unique=True)
+            mask = np.zeros(size, dtype=bool)
+            mask[candidates] = True
+            phrase_scores[~mask] = 0
+            scores += phrase_scores
+            phrases.append((re.compile(phrase_regex(tokens)), mask, phrase_scores))
+        for term in query.excluded:
+            scores[self.__postings(term, self.__live()[0])[0]] = 0
+        if boost is not None:
+            scores *= boost
+        matched = np.flatnonzero(scores > 0)
+        if not phrases:
+            best = matched[np.argsort(-scores[matched], kind='stable')[:k]]
+            return [(self.names[doc], float(scores[doc])) for doc in best], len(matched)
+        results = list()
+        demoted = list()
+        for doc in matched[np.argsort(-scores[matched], kind='stable')].tolist():
+            while demoted and -demoted[0][0] >= scores[doc] and len(results) < k:
+                score, other = heapq.heappop(demoted)
+                results.append((self.names[other], -score))
+            if len(results) >= k:
+                break
+            text = documents.lower(self.names[doc])
+            score = scores[doc]
+            for pattern, mask, phrase_scores in phrases:
+                if mask[doc] and not pattern.search(text):
+                    score -= phrase_scores[doc] * (boost[doc] if boost is not None else 1)
+            if score >= scores[doc]:
+                results.append((self.names[doc], float(score)))
+            elif score > 1e-12:
+                heapq.heappush(demoted, (-float(score), doc))
+        while demoted and len(results) < k:
+            score, other = heapq.heappop(demoted)
+            results.append((self.names[other], -score))
+        return results, len(matched)
+
+    def boost_vector(self, nodes: list, values: np.ndarray, weight: float = 1.0) -> np.ndarray:
+        """
+        Returns score factors by document id of 1 + weight * value / max(values), e.g. for a centrality of the graph.
+        The factors of the last values are kept until the documents change.
+        """
+        # Snapshots are shared between request threads, so _boost is read once and may be replaced concurrently.
+        cached = self._boost
+        if cached is not None and cached[0] is values and cached[1] == weight:
+            return cached[2]
+        boost = np.ones(len(self.names))
+        top = values.max(initial=0)
+        if top:
+            for node, value in zip(nodes, (values / top).tolist()):
+                doc = self.ids.get(node)
+                if doc is not None:
+                    boost[doc] += weight * value
+        self._boost = (values, weight, boost)
+        return boost
+    # }}}
@@ -0,0 +1,38 @@
+class SharedDict(dict):
+    """
+    Dict of mutable values, such as sets, that a copy shares with the dict it was copied from until they change. copy()
+    only copies the keys and writable() copies a value the first time it is changed afterwards, so an incremental
+    update of a copy costs time proportional to the values it touches. Values must only be changed through writable()
+    and the dict that was copied must not be changed anymore.
+    """
+
+    __slots__ = ('_shared', '_owned')
+
+    def __init__(self, *args):
+        super().__init__(*args)
+        self._shared = False
+        self._owned = set()
+
+    def copy(self) -> 'SharedDict':
+        values = SharedDict(self)
+        values._shared = True
+        return values
+
+    def writable(self, key, factory=None):
+        """
+        Returns the value of key, copied first if it is still shared.
+
+        Args:
+            key
+            factory: Called to create the value if key is missing. A KeyError is raised if it is None.
+        """
+        value = self.get(key)
+        if value is None:
+            if factory is None:
+                raise KeyError(key)
+            value = self[key] = factory()
+            self._owned.add(key)
+        elif self._shared and key not in self._owned:
+            value = self[key] = type(value)(value)
+            self._owned.add(key)
+        return value
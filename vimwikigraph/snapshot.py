@@ -0,0 +1,32 @@
+class GraphSnapshot:
+    """
+    Read-only state of a parsed wiki: the link graph, the documents, their content index and their tags. A snapshot is
+    never changed after it has been published, except that its full-text search index is built on first use. A reload
+    builds a new snapshot that shares everything unchanged with the previous one and swaps it in with a single
+    assignment, so requests that still hold the previous snapshot keep a consistent view until they drop their
+    reference.
+    """
+
+    __slots__ = ('root_dir', 'graph', 'lines', 'index', 'version', 'positions', 'tags', 'search')
+
+    def __init__(self, root_dir: str, graph, lines, index, version: int = 0, positions: dict = None,
+                 tags=None, search=None):
+        """
+        Args:
+            root_dir (str): Root directory of the wiki.
+            graph (nx.DiGraph): Link graph.
+            lines (DocumentStore): Documents by node.
+            index (ContentIndex): Content index of lines.
+            version (int): Incremented by every reload that changes the wiki.
+            positions (dict): Maps nodes to their (x, y) layout positions, or None if the graph is not laid out.
+            tags (VimwikiTags): Tag index of lines.
+            search (SearchIndex): Full-text index of lines, or None if it has not been built yet.
+        """
+        self.root_dir = root_dir
+        self.graph = graph
+        self.lines = lines
+        self.index = index
+        self.version = version
+        self.positions = positions
+        self.tags = tags
+        self.search = search
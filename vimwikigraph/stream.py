@@ -0,0 +1,234 @@
+import itertools
+import json
+import threading
+import zlib
+from bisect import bisect_left, bisect_right
+from collections import deque
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+DEFAULT_NODE_SIZE = 10
+DEFAULT_NODE_COLOR = '#97c2fc'
+
+
+def vis_node(node, attributes: dict, position: tuple = None) -> dict:
+    """
+    Returns the vis.js node of a graph node like pyvis' Network.from_nx does.
+
+    Args:
+        node: The node id.
+        attributes (dict): The node attributes. The dict is modified.
+        position (tuple): Precomputed (x, y) position. The node is excluded from the physics simulation if given.
+    """
+    attributes['size'] = int(attributes.get('size', DEFAULT_NODE_SIZE))
+    if 'group' not in attributes:
+        attributes.setdefault('color', DEFAULT_NODE_COLOR)
+    attributes['label'] = attributes.get('label') or node
+    attributes.setdefault('shape', 'dot')
+    attributes['id'] = node
+    if position is not None:
+        attributes['x'], attributes['y'] = round(position[0], 1), round(position[1], 1)
+        attributes['physics'] = False
+    return attributes
+
+
+def vis_edge(u, v, attributes: dict) -> dict:
+    """
+    Returns the vis.js edge of a graph edge like pyvis' Network.from_nx does.
+
+    Args:
+        u: The source node id.
+        v: The target node id.
+        attributes (dict): The edge attributes. The dict is modified.
+    """
+    if 'value' not in attributes or 'width' not in attributes:
+        attributes['width'] = attributes.pop('weight', 1)
+    attributes['from'] = u
+    attributes['to'] = v
+    return attributes
+
+
+class NetworkStream:
+    """
+    Serializes a GraphView to vis.js nodes and edges without building a pyvis Network. Nodes are ordered breadth first
+    around a center node, so the first nodes of the stream are the neighborhood of the center. Every edge is sent
+    right after the later of its two nodes, so every prefix of the stream is a consistent graph that can be rendered.
+    The order is computed lazily while nodes are requested, so the first nodes are sent before the whole graph was
+    traversed.
+    """
+
+    def __init__(self, view, center=None, positions: dict = None):
+        """
+        Args:
+            view (GraphView): The view to serialize. It must not change while the stream is in use.
+            center: Node to start at. Defaults to the node with the most links in the base graph.
+            positions (dict): Maps nodes to precomputed (x, y) positions.
+        """
+        self.view = view
+        self.positions = positions or dict()
+        if center not in view:
+            base = view.base
+            center = max(view, key=lambda node: base.in_degree(node) + base.out_degree(node), default=None)
+        self.nodes = list()
+        self.edges = list()
+        self.edge_ranks = list()
+        self._rank = dict()
+        self._order = self.__order(center)
+        self._complete = False
+        # Base positions of the nodes, which decide the direction of links in both directions.
+        self._position = None
+        # Streams are shared between requests, which advance the order concurrently.
+        self._lock = threading.Lock()
+
+    def __order(self, center):
+        """
+        Yields the visible nodes in breadth first order around center, followed by the other components, together with
+        their successors and predecessors.
+        """
+        view = self.view
+        visited = set()
+        for root in itertools.chain([center] if center is not None else [], view):
+            if root in visited:
+                continue
+            visited.add(root)
+            queue = deque([root])
+            while queue:
+                node = queue.popleft()
+                successors, predecessors = list(view.successors(node)), list(view.predecessors(node))
+                yield node, successors, predecessors
+                for neighbor in itertools.chain(successors, predecessors):
+                    if neighbor not in visited:
+                        visited.add(neighbor)
+                        queue.append(neighbor)
+
+    def __before(self, u, v) -> bool:
+        """
+        Whether the edge (u, v) comes before (v, u) in the edges of the view as a graph, i.e. whether u does.
+        """
+        if self._position is None:
+            self._position = {node: i for i, node in enumerate(self.view.base)}
+        return self._position[u] < self._position[v]
+
+    def __add(self, node, successors: list, predecessors: list):
+        """
+        Appends node and its edges to the nodes before it. pyvis treats the network as undirected and keeps only the
+        first of two links in opposite directions.
+        """
+        rank = len(self.nodes)
+        ranks = self._rank
+        ranks[node] = rank
+        self.nodes.append(node)
+        # Both ends are visible, so without contractions the base graph has the attributes.
+        edge_data = self.view.get_edge_data if self.view.merged else self.view.base.get_edge_data
+        successors = [successor for successor in successors if successor in ranks]
+        predecessors = [predecessor for predecessor in predecessors if predecessor in ranks and predecessor != node]
+        both = set(successors).intersection(predecessors) if successors and predecessors else ()
+        for successor in successors:
+            if successor not in both or self.__before(node, successor):
+                self.edges.append((node, successor, edge_data(node, successor)))
+                self.edge_ranks.append(rank)
+        for predecessor in predecessors:
+            if predecessor not in both or self.__before(predecessor, node):
+                self.edges.append((predecessor, node, edge_data(predecessor, node)))
+                self.edge_ranks.append(rank)
+
+    def __advance(self, end: int = None):
+        """
+        Orders the nodes up to end, or all nodes if end is None.
+        """
+        with self._lock:
+            while not self._complete and (end is None or len(self.nodes) < end):
+                item = next(self._order, None)
+                if item is None:
+                    self._complete = True
+                    # The traversal and its visited set are not needed anymore.
+                    self._order = None
+                else:
+                    self.__add(*item)
+
+    def complete(self) -> 'NetworkStream':
+        """
+        Orders all nodes and returns the stream.
+        """
+        self.__advance()
+        return self
+
+    def __len__(self):
+        self.__advance()
+        return len(self.nodes)
+
+    def page(self, offset: int = 0, limit: int = None):
+        """
+        Returns the vis.js nodes from offset up to offset + limit and the edges between them and the previous nodes.
+        """
+        self.__advance(None if limit is None else offset + limit)
+        end = len(self.nodes) if limit is None else min(offset + limit, len(self.nodes))
+        nodes = [vis_node(node, self.view.node_attributes(node), self.positions.get(node))
+                 for node in self.nodes[offset:end]]
+        start, stop = bisect_left(self.edge_ranks, offset), bisect_right(self.edge_ranks, end - 1)
+        edges = [vis_edge(u, v, dict(attributes)) for u, v, attributes in self.edges[start:stop]]
+        return nodes, edges
+
+    def json(self, offset: int = 0, limit: int = None) -> dict:
+        """
+        Returns a page as a dict with its nodes and edges, the total number of nodes and the offset of the next page
+        or None.
+        """
+        nodes, edges = self.page(offset, limit)
+        following = offset + len(nodes)
+        return {
+            'nodes': nodes,
+            'edges': edges,
+            'total': len(self),
+            'next': following if following < len(self) else None,
+        }
+
+    def ndjson(self, offset: int = 0, limit: int = None, batch: int = 500):
+        """
+        Yields the nodes from offset up to offset + limit as newline delimited JSON. Every line is one batch of the
+        form {"nodes": [...], "edges": [...]} and the last line is {"total": ..., "next": ...}.
+        """
+        start = offset
+        while limit is None or start < offset + limit:
+            nodes, edges = self.page(start, batch if limit is None else min(batch, offset + limit - start))
+            if not nodes:
+                break
+            yield json.dumps({'nodes': nodes, 'edges': edges}).encode() + b'\n'
+            start += len(nodes)
+        end = min(start, len(self))
+        yield json.dumps({'total': len(self), 'next': end if end < len(self) else None}).encode() + b'\n'
+
+
+def accepted_encoding(accept_encodings) -> str:
+    """
+    Returns the best supported content encoding of the Accept-Encoding header of a request, or None.
+
+    Args:
+        accept_encodings (werkzeug.datastructures.Accept): request.accept_encodings
+    """
+    return accept_encodings.best_match(['br', 'gzip'] if brotli is not None else ['gzip'])
+
+
+def compress(chunks, encoding: str = None):
+    """
+    Compresses a stream of byte strings chunk by chunk and flushes after every chunk, so the client can decode each
+    chunk as soon as it arrives.
+    """
+    if encoding is None:
+        yield from chunks
+    elif encoding == 'br':
+        compressor = brotli.Compressor()
+        for chunk in chunks:
+            yield compressor.process(chunk) + compressor.flush()
+        yield compressor.finish()
+    elif encoding == 'gzip':
+        compressor = zlib.compressobj(wbits=31)
+        for chunk in chunks:
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        yield compressor.flush()
+    else:
+        raise ValueError(f"Invalid encoding '{encoding}', expected 'br' or 'gzip'")
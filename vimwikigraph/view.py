@@ -0,0 +1,300 @@
+import itertools
+
+import networkx as nx
+import numpy as np
+
+from .csr import CSRGraph
+
+
+class GraphView:
+    """
+    Copy-on-write view of a base graph. Removing nodes only records them in a mask, attribute changes go into a sparse
+    per-node overlay and contracted nodes are mapped onto the node they were contracted into. The base graph is never
+    modified, so creating a view takes constant time and its memory grows only with the changes made to it.
+    """
+
+    def __init__(self, base):
+        self.base = base
+        self.hidden = set()
+        self.attributes = dict()
+        self.merged = dict()
+        self.members = dict()
+        self._materialized = None
+        self._number_of_edges = None
+        self._positions = None
+
+    @property
+    def name(self):
+        return self.base.graph.get('name', '')
+
+    def rebase(self, base) -> 'GraphView':
+        """
+        Returns a view of another base graph with the same hidden nodes, attributes and contractions.
+        """
+        view = GraphView(base)
+        view.hidden = set(self.hidden)
+        view.attributes = {node: dict(attributes) for node, attributes in self.attributes.items()}
+        view.merged = dict(self.merged)
+        view.members = {node: list(members) for node, members in self.members.items()}
+        return view
+
+    def invalidate(self):
+        """
+        Drops the materialized graph and edge count. Must be called after the view or its base graph changed.
+        """
+        self._materialized = None
+        self._number_of_edges = None
+
+    # {{{ Queries
+    def representative(self, node):
+        """
+        Returns the visible node that node is shown as, i.e. node itself or the node it was contracted into, or None if
+        node is not part of the view.
+        """
+        if node not in self.base or node in self.hidden:
+            return None
+        while node in self.merged:
+            node = self.merged[node]
+            if node in self.hidden:
+                return None
+        return node
+
+    def __contains__(self, node):
+        return node in self.base and node not in self.hidden and node not in self.merged
+
+    def __iter__(self):
+        return self.nodes()
+
+    def __len__(self):
+        return self.number_of_nodes()
+
+    def nodes(self, data: bool = False):
+        for node in self.base:
+            if node not in self.hidden and node not in self.merged:
+                yield (node, self.node_attributes(node)) if data else node
+
+    def number_of_nodes(self):
+        removed = {node for node in self.hidden if node in self.base}
+        removed.update(node for node in self.merged if node in self.base)
+        return len(self.base) - len(removed)
+
+    def node_attributes(self, node) -> dict:
+        """
+        Returns a new dict with the base attributes of node updated by the overlay.
+        """
+        attributes = dict(self.base.nodes[node])
+        attributes.update(self.attributes.get(node, ()))
+        return attributes
+
+    def get_node_attribute(self, node, attribute, default=None):
+        overlay = self.attributes.get(node)
+        if overlay and attribute in overlay:
+            return overlay[attribute]
+        return self.base.nodes[node].get(attribute, default)
+
+    def __group(self, node):
+        stack = [node]
+        while stack:
+            member = stack.pop()
+            yield member
+            stack.extend(self.members.get(member, ()))
+
+    def successors(self, node):
+        if not self.merged:
+            hidden = self.hidden
+            return (successor for successor in self.base.successors(node) if successor not in hidden)
+        return self.__grouped_successors(node)
+
+    def predecessors(self, node):
+        if not self.merged:
+            hidden = self.hidden
+            return (predecessor for predecessor in self.base.predecessors(node) if predecessor not in hidden)
+        return self.__grouped_predecessors(node)
+
+    def __grouped_successors(self, node):
+        seen = set()
+        for member in self.__group(node):
+            for successor in self.base.successors(member):
+                shown = self.representative(successor)
+                if shown is None or shown in seen or (shown == node and (member != node or successor != node)):
+                    continue
+                seen.add(shown)
+                yield shown
+
+    def __grouped_predecessors(self, node):
+        seen = set()
+        for member in self.__group(node):
+            for predecessor in self.base.predecessors(member):
+                shown = self.representative(predecessor)
+                if shown is None or shown in seen or (shown == node and (member != node or predecessor != node)):
+                    continue
+                seen.add(shown)
+                yield shown
+
+    def edges(self, data: bool = False):
+        """
+        Yields the visible edges. Edges of contracted nodes are yielded as edges of the node they were contracted into
+        without duplicates. Self loops that only arise from a contraction are dropped, links of a page to itself are
+        kept.
+        """
+        seen = set()
+        for u, v, attributes in self.base.edges(data=True):
+            if u in self.hidden or v in self.hidden:
+                continue
+            if self.merged:
+                shown_u, shown_v = self.representative(u), self.representative(v)
+                if shown_u is None or shown_v is None or (shown_u, shown_v) in seen:
+                    continue
+                if shown_u == shown_v and (shown_u != u or shown_v != v):
+                    continue
+                u, v = shown_u, shown_v
+                seen.add((u, v))
+            yield (u, v, attributes) if data else (u, v)
+
+    def get_edge_data(self, u, v, default=None):
+        """
+        Returns the attributes of the visible edge (u, v), or default if there is no such edge. Like in edges(), the edge
+        of contracted nodes has the attributes of the first link between their members in the base graph.
+        """
+        if u not in self or v not in self:
+            return default
+        if not self.merged:
+            return self.base.get_edge_data(u, v, default)
+        if self._positions is None:
+            self._positions = {node: i for i, node in enumerate(self.base)}
+        for member in sorted(self.__group(u), key=self._positions.__getitem__):
+            for successor in self.base.successors(member):
+                if self.representative(successor) == v and (u != v or member == successor == u):
+                    return self.base.get_edge_data(member, successor, default)
+        return default
+
+    def number_of_edges(self) -> int:
+        """
+        Returns the number of visible edges, kept until the view changes. Without contractions only the edges of the
+        hidden or of the visible nodes, whichever are fewer, are looked at.
+        """
+        if self._number_of_edges is None:
+            base = self.base
+            hidden = {node for node in self.hidden if node in base}
+            if self.merged:
+                count = sum(1 for _ in self.edges())
+            elif len(hidden) <= len(base) - len(hidden):
+                removed = set()
+                for node in hidden:
+                    removed.update((node, successor) for successor in base.successors(node))
+                    removed.update((predecessor, node) for predecessor in base.predecessors(node))
+                count = base.number_of_edges() - len(removed)
+            else:
+                count = sum(1 for node in base if node not in hidden
+                            for successor in base.successors(node) if successor not in hidden)
+            self._number_of_edges = count
+        return self._number_of_edges
+
+    def adjacency(self):
+        """
+        Returns the list of visible nodes together with arrays of the source and target indices of the visible edges.
+        """
+        base = self.base
+        if isinstance(base, CSRGraph) and not self.merged:
+            visible = np.ones(len(base), dtype=bool)
+            visible[[base.index[node] for node in self.hidden if node in base.index]] = False
+            ids = np.cumsum(visible) - 1
+            sources = base.sources()
+            kept = visible[sources] & visible[base.indices]
+            nodes = [node for node, shown in zip(base.names, visible.tolist()) if shown]
+            return nodes, ids[sources[kept]], ids[base.indices[kept]]
+        nodes = list(self.nodes())
+        index = {node: i for i, node in enumerate(nodes)}
+        edges = np.array([(index[u], index[v]) for u, v in self.edges()], dtype=np.int64).reshape(-1, 2)
+        return nodes, edges[:, 0], edges[:, 1]
+
+    def neighborhood(self, node, depth: int = 1, direction: str = 'both', limit: int = None) -> dict:
+        """
+        Breadth first search from node over the visible links and backlinks.
+
+        Args:
+            node: A visible node.
+            depth (int): Maximum distance from node.
+            direction (str): 'out' follows links, 'in' follows backlinks and 'both' follows both.
+            limit (int): Maximum number of nodes including node. Closer nodes are kept first.
+
+        Returns:
+            dict: Maps the nodes within depth of node to their distance in breadth first order.
+        """
+        if direction not in ('in', 'out', 'both'):
+            raise ValueError(f"Invalid direction '{direction}', expected 'in', 'out' or 'both'")
+        if node not in self:
+            raise KeyError(node)
+        distances = {node: 0}
+        level = [node]
+        for distance in range(1, depth + 1):
+            next_level = list()
+            for current in level:
+                neighbors = list()
+                if direction != 'in':
+                    neighbors.append(self.successors(current))
+                if direction != 'out':
+                    neighbors.append(self.predecessors(current))
+                for neighbor in itertools.chain(*neighbors):
+                    if neighbor not in distances:
+                        if limit is not None and len(distances) >= limit:
+                            return distances
+                        distances[neighbor] = distance
+                        next_level.append(neighbor)
+            level = next_level
+        return distances
+    # }}}
+
+    # {{{ Changes
+    def remove_nodes_from(self, nodes):
+        self.hidden.update(node for node in nodes if node in self.base)
+        self.invalidate()
+
+    def set_node_attribute(self, node, attribute, value):
+        self.attributes.setdefault(node, dict())[attribute] = value
+        self.invalidate()
+
+    def set_node_attributes(self, attribute, values: dict):
+        """
+        Sets attribute of every node in values to its value.
+        """
+        for node, value in values.items():
+            self.attributes.setdefault(node, dict())[attribute] = value
+        self.invalidate()
+
+    def contract(self, groups: dict):
+        """
+        Contracts every group of children into its node in a single change. Their edges become edges of the node.
+
+        Args:
+            groups (dict): Maps nodes to the children to contract into them.
+        """
+        for node, children in groups.items():
+            for child in children:
+                child = self.representative(child)
+                if child is None or child == node:
+                    continue
+                self.merged[child] = node
+                self.members.setdefault(node, list()).append(child)
+        self.invalidate()
+
+    def expand(self, node):
+        """
+        Undoes the contractions into node. The members record which nodes were contracted, so the edges of node are
+        restored without looking at the base graph.
+        """
+        for child in self.members.pop(node, ()):
+            del self.merged[child]
+        self.invalidate()
+    # }}}
+
+    def to_networkx(self) -> nx.DiGraph:
+        """
+        Returns the view as a new DiGraph with its own attribute dicts. The result is cached until the view changes.
+        """
+        if self._materialized is None:
+            graph = nx.DiGraph(name=self.name)
+            graph.add_nodes_from(self.nodes(data=True))
+            graph.add_edges_from((u, v, dict(attributes)) for u, v, attributes in self.edges(data=True))
+            self._materialized = graph
+        return self._materialized
@@ -1,43 +1,86 @@
-import copy
+import hashlib
+import itertools
 import os
-import re
+import sys
+import threading
 import traceback
-import logging
-from logging import critical, debug, error, info, warning
+from logging import debug, info
 
 import networkx as nx
 import numpy as np
-from pyvis.network import Network
 
+from .cache import ParseCache
+from .centrality import centrality
+from .csr import CSRGraph
+from .documents import DocumentStore
+from .export import export
+from .index import ContentIndex
+from .ingest import LINK_REGEX, TAG_REGEX, ingest
+from .layout import layout_graph
+from .metrics import metrics
+from .patterns import compile_patterns
+from .search import SearchIndex
+from .snapshot import GraphSnapshot
+from .view import GraphView
+from .vimwikitags import VimwikiTags
+
+
+# Serializes building the search index of a snapshot on first use.
+_search_lock = threading.Lock()
 
 class VimwikiGraph:
 
     # {{{ Private
-    def __init__(self, root_dir: str, file_extensions: list = ['wiki'], graph_name: str = 'vimwikigraph', **args):
+    def __init__(self, root_dir: str, file_extensions: list = ['wiki'], graph_name: str = 'vimwikigraph',
+                 cache_path: str = '', workers: int = 1, executor: str = 'thread', lowercase: bool = True,
+                 backend: str = 'networkx', layout: bool = False, **args):
         # logging.basicConfig(level=logging.DEBUG)
         self.graph_name = graph_name
-        self.graph = nx.DiGraph(name=graph_name)
         self.root_dir = root_dir
         self.file_extensions = file_extensions
-        self.lines = dict()
-        node_dict = self.__create_nodes()
-        self.__parse_and_add_edges(node_dict)
-        self.original_graph = copy.deepcopy(self.graph)
-
-    def __normalize_path(self, root, link):
-        if re.match(r'https?://', link):
-            link = re.sub(r'.*:/+', '', link)
-            link = re.sub(r'/.*', '', link)
-            return link
-        if re.match('file:/', link):
-            link = re.sub(r'.*:/+', '', link)
-            link = re.sub(r'.*/', '', link)
-            return link
-        path = os.path.join(root, link)
-        path = re.sub(r':', '', path)
-        if not path.endswith(".wiki"):
-            path += ".wiki"
-        return re.sub(r'[^/]+/\.\./', '', path)
+        if backend not in ('networkx', 'csr'):
+            raise ValueError(f"Invalid backend '{backend}', expected 'networkx' or 'csr'")
+        self.backend = backend
+        self.layout = layout
+        self.snapshot = GraphSnapshot(root_dir, nx.DiGraph(name=graph_name), DocumentStore(lowercase=lowercase), None,
+                                      tags=VimwikiTags())
+        self.file_stats = dict()
+        self.workers = workers
+        self.executor = executor
+        self.cache = None
+        if cache_path:
+            self.cache = ParseCache(cache_path, {
+                'root_dir': os.path.abspath(root_dir),
+                'file_extensions': sorted(file_extensions),
+                'link_regex': LINK_REGEX,
+                'tag_regex': TAG_REGEX,
+            })
+        with metrics.stage('parse'):
+            node_dict = self.__scan_files()
+            edges, edge_attributes, stale = self.__parse_files(node_dict)
+            self.snapshot.graph = self.__create_graph(node_dict, edges, edge_attributes)
+        with metrics.stage('index'):
+            self.snapshot.index = ContentIndex(self.lines)
+        if layout:
+            with metrics.stage('layout'):
+                previous = self.cache.load_positions() if self.cache else None
+                # Pages whose links changed since the positions were cached move again.
+                self.snapshot.positions = self.__update_layout(self.original_graph, previous, stale)
+        self.view = GraphView(self.original_graph)
+        self._stats_digest = None
+
+    @classmethod
+    def from_snapshot(cls, snapshot: GraphSnapshot) -> 'VimwikiGraph':
+        """
+        Returns a VimwikiGraph with its own view of a shared snapshot. Graph operations on it never affect other
+        VimwikiGraphs of the same snapshot, but it cannot be reloaded.
+        """
+        vimwikigraph = cls.__new__(cls)
+        vimwikigraph.graph_name = snapshot.graph.graph.get('name', '')
+        vimwikigraph.root_dir = snapshot.root_dir
+        vimwikigraph.snapshot = snapshot
+        vimwikigraph.view = GraphView(snapshot.graph)
+        return vimwikigraph
 
     def __resolve_relative_path(self, path):
         if path[0] == '/':
@@ -47,69 +90,400 @@ class VimwikiGraph:
     def __add_suffix_to_node(self, path):
         if not path.endswith(".wiki"):
             return path + ".wiki"
+        return path
 
-    def __create_nodes(self):
+    def __scan_files(self):
+        """
+        Returns a dict mapping every wiki file below root_dir to its directory.
+        """
         node_dict = dict()
         for root, dir, files in os.walk(self.root_dir):
             for file in files:
-                split = file.split('.')
-                if split[-1] in self.file_extensions:
-                    name = os.path.join(root, file)
-                    node_dict[name] = root
-                    self.graph.add_node(name, label='.'.join(split[:-1]))
+                if file.split('.')[-1] in self.file_extensions:
+                    node_dict[sys.intern(os.path.join(root, file))] = root
         return node_dict
 
-    def __parse_and_add_edges(self, node_dict):
+    def __scan_paths(self, paths):
+        """
+        Like __scan_files but restricted to the given files and directories. Also returns the known files among them
+        that no longer exist.
+        """
+        node_dict = dict()
+        removed = list()
+        for path in paths:
+            if os.path.isdir(path):
+                for root, dir, files in os.walk(path):
+                    for file in files:
+                        if file.split('.')[-1] in self.file_extensions:
+                            node_dict[sys.intern(os.path.join(root, file))] = root
+            elif os.path.isfile(path) and path.split('.')[-1] in self.file_extensions:
+                node_dict[sys.intern(path)] = os.path.dirname(path)
+            prefix = path.rstrip('/') + '/'
+            removed.extend(name for name in self.file_stats
+                           if (name == path or name.startswith(prefix)) and name not in node_dict
+                           and not os.path.isfile(name))
+        return node_dict, list(dict.fromkeys(removed))
+
+    def __node_label(self, name):
+        return '.'.join(os.path.basename(name).split('.')[:-1])
+
+    def __create_graph(self, node_dict, edges, edge_attributes):
+        """
+        Returns a graph of the configured backend with a labeled node for every file and the edges. edge_attributes
+        maps the edges that have attributes to them.
+        """
+        if self.backend == 'csr':
+            labels = [self.__node_label(name) for name in node_dict]
+            edge_columns = dict()
+            for edge, attributes in edge_attributes.items():
+                for attribute, value in attributes.items():
+                    edge_columns.setdefault(attribute, dict())[edge] = value
+            return CSRGraph(self.graph_name, list(node_dict), {'label': labels}, edges, edge_columns)
+        graph = nx.DiGraph(name=self.graph_name)
+        for name in node_dict:
+            graph.add_node(name, label=self.__node_label(name))
+        graph.add_edges_from(edges)
+        for (u, v), attributes in edge_attributes.items():
+            graph.edges[u, v].update(attributes)
+        return graph
+
+    def __parse_files(self, node_dict):
+        """
+        Reads the files, reusing fresh cache entries, indexes their tags and returns the list of their links as edges
+        together with a dict that maps the edges of links with attributes to them and the list of files that were not
+        fresh in the cache.
+        """
+        cached = self.cache.load() if self.cache else dict()
+        parsed = dict()
+        stale = dict()
         for name, root in node_dict.items():
-            with open(name, 'r') as f:
-                lines = f.readlines()
-            self.lines[name] = lines
-            for line in lines:
-                links = re.findall(r'\[\[([^#|\[\]]+)(#[^|\[\]]*)?(|[^\]]*)?\]\]', line)
-                for link in links:
-                    child_node = self.__normalize_path(root, link[0])
-                    self.graph.add_edge(name, child_node)
-
-    def __filter_lines(self, regexes: list, lines: list):
+            entry = cached.pop(name, None)
+            stat = os.stat(name)
+            if entry and entry[0][:2] == (stat.st_mtime_ns, stat.st_size):
+                parsed[name] = (entry[0], ParseCache.text(entry[1]), ParseCache.links(entry[2]),
+                                ParseCache.tags(entry[3]))
+            else:
+                stale[name] = root
+        updated = dict()
+        for name, stats, text, links, tags in ingest(stale, self.workers, self.executor):
+            parsed[name] = updated[name] = (stats, text, links, tags)
+        edges = list()
+        edge_attributes = dict()
+        for name in node_dict:
+            self.file_stats[name], self.lines[name], links, tags = parsed[name]
+            self.tags.update(name, tags)
+            # Edges are tuples of strings only, which the garbage collector stops tracking.
+            edges.extend(zip(itertools.repeat(name), links))
+            if any(links.values()):
+                edge_attributes.update(((name, target), attributes) for target, attributes in links.items()
+                                       if attributes)
+        if self.cache:
+            self.cache.put(updated)
+            self.cache.delete(list(cached))
+        return edges, edge_attributes, list(stale)
+
+    def __copy_graph(self, graph: nx.DiGraph, nodes: set, edges) -> nx.DiGraph:
+        """
+        Returns a copy of graph that shares the attributes and adjacency dicts of all nodes with graph except those of
+        nodes, and the attributes of all edges except those of edges. Only the outer dicts are copied, so the copy takes
+        time proportional to the number of nodes and the size of the copied dicts. The endpoints of edges must be in
+        nodes and graph must not be changed anymore.
+        """
+        copy = graph.__class__()
+        copy.graph.update(graph.graph)
+        copy._node = dict(graph._node)
+        copy._adj = copy._succ = dict(graph._succ)
+        copy._pred = dict(graph._pred)
+        for node in nodes:
+            if node in graph._node:
+                copy._node[node] = dict(graph._node[node])
+                copy._succ[node] = dict(graph._succ[node])
+                copy._pred[node] = dict(graph._pred[node])
+        for u, v in edges:
+            if u in graph._succ and v in graph._succ[u]:
+                copy._succ[u][v] = copy._pred[v][u] = dict(graph._succ[u][v])
+        return copy
+
+    def __patch_graph(self, graph, added_files, removed_nodes, added_edges, removed_edges, edge_attributes):
+        graph.remove_edges_from(removed_edges)
+        graph.add_edges_from(added_edges)
+        for (u, v), attributes in edge_attributes.items():
+            if graph.has_edge(u, v):
+                data = graph.edges[u, v]
+                data.clear()
+                data.update(attributes)
+        for name in added_files:
+            graph.add_node(name, label=self.__node_label(name))
+        for name in removed_nodes:
+            if graph.has_node(name):
+                graph.remove_node(name)
+
+    def __descendants(self, roots: list, depth: int):
+        """
+        Returns a dict mapping every root to its descendants up to depth in one breadth-first search from all roots.
+        A descendant of several roots belongs to the closest one or, if there is a tie, to the first one. Roots are
+        never descendants of other roots.
+        """
+        owner = {root: root for root in roots}
+        groups = {root: list() for root in roots}
+        level = roots
+        for _ in range(depth):
+            next_level = list()
+            for parent in level:
+                root = owner[parent]
+                for child in self.view.successors(parent):
+                    if child not in owner:
+                        owner[child] = root
+                        groups[root].append(child)
+                        next_level.append(child)
+            level = next_level
+        return groups
+
+    def __update_layout(self, graph, previous: dict = None, changed=()) -> dict:
+        """
+        Lays out graph, moving only the nodes that are new or changed since previous, and writes the moved positions
+        through to the cache.
+        """
+        positions = layout_graph(graph, previous, changed)
+        if self.cache:
+            previous = previous or dict()
+            self.cache.put_positions({node: xy for node, xy in positions.items() if previous.get(node) != xy})
+            self.cache.delete_positions([node for node in previous if node not in positions])
+        return positions
+
+    def __filter_text(self, patterns: list, text: str):
         """
-        Returns the number of regexes that matched any of the lines in lines.
+        Returns the number of patterns that match text.
 
         Args:
-            regexes (list): List of regular expressions.
-            lines (list): List of lines to match.
+            patterns (list): List of compiled regular expressions.
+            text (str): Text to match.
         """
-        matches = 0
-        try:
-            for regex in regexes:
-                for line in lines:
-                    if re.search(regex, line.lower()):
-                        matches += 1
-                        break
-        except Exception as e:
-            print(e)
-        return matches
+        return sum(1 for pattern in patterns if pattern.search(text))
 
-    def __filter_lines_all(self, regexes: list, lines: list, invert: bool = False):
+    def __filter_text_all(self, patterns: list, text: str, invert: bool = False):
         if invert:
-            return self.__filter_lines(regexes, lines) == 0
-        return self.__filter_lines(regexes, lines) == len(regexes)
+            return self.__filter_text(patterns, text) == 0
+        return self.__filter_text(patterns, text) == len(patterns)
+
+    def __filter_text_any(self, patterns: list, text: str):
+        return self.__filter_text(patterns, text) > 0
 
-    def __filter_lines_any(self, regexes: list, lines: list):
-        return self.__filter_lines(regexes, lines) > 0
+    def __filter_documents(self, regexes: list, nodes, invert: bool = False):
+        """
+        Returns the set of nodes whose lowercased documents are matched by all regexes or, if invert, by none of them.
+        Each regex is searched once per document in multiline mode and only in the candidate documents the content
+        index returns for it.
+
+        Args:
+            regexes (list): List of regular expressions.
+            nodes: Nodes to filter.
+            invert (bool)
+        """
+        patterns = compile_patterns(regexes)
+        candidates = [self.index.candidates(regex) for regex in regexes]
+        if not invert and candidates and None not in candidates:
+            smallest = min(candidates, key=len)
+            nodes = [node for node in smallest if node in nodes and all(node in c for c in candidates)]
+        matched = set()
+        lines = self.lines
+        for node in nodes:
+            # Nodes without a document, e.g. URL hosts and dangling links, match no regex, not even an empty match.
+            if node not in lines:
+                if invert:
+                    matched.add(node)
+                continue
+            possible = [pattern for pattern, c in zip(patterns, candidates) if c is None or node in c]
+            text = lines.lower(node)
+            if invert:
+                if not possible or self.__filter_text(possible, text) == 0:
+                    matched.add(node)
+            elif len(possible) == len(patterns) and self.__filter_text(possible, text) == len(patterns):
+                matched.add(node)
+        return matched
     # }}}
 
     # {{{ Graph Operations
+    def stats_digest(self) -> str:
+        """
+        Returns a digest of the paths, mtimes, sizes and hashes of all files. It changes whenever a reload changes the
+        wiki.
+        """
+        if self._stats_digest is None:
+            digest = hashlib.blake2b(digest_size=16)
+            for name in sorted(self.file_stats):
+                digest.update(f"{name}\0{self.file_stats[name]}\n".encode())
+            self._stats_digest = digest.hexdigest()
+        return self._stats_digest
+
+    @property
+    def original_graph(self) -> nx.DiGraph:
+        return self.snapshot.graph
+
+    @property
+    def lines(self) -> DocumentStore:
+        return self.snapshot.lines
+
+    @property
+    def index(self) -> ContentIndex:
+        return self.snapshot.index
+
+    @property
+    def tags(self) -> VimwikiTags:
+        return self.snapshot.tags
+
+    @property
+    def search_index(self) -> SearchIndex:
+        """
+        The full-text index of lines. It is built on first use and then kept up to date by reloads.
+        """
+        if self.snapshot.search is None:
+            with _search_lock:
+                if self.snapshot.search is None:
+                    with metrics.stage('search_index'):
+                        self.snapshot.search = SearchIndex(self.lines)
+        return self.snapshot.search
+
+    @property
+    def graph(self) -> nx.DiGraph:
+        """
+        The current view of the graph as a DiGraph. It is built from the view on first access after each change.
+        """
+        return self.view.to_networkx()
+
     def reset_graph(self):
-        self.graph = copy.deepcopy(self.original_graph)
+        """
+        Discards all filters, attributes and contractions by starting a new view of original_graph.
+        """
+        self.view = GraphView(self.original_graph)
         return self
 
-    def reload_graph(self):
-        del self.graph, self.original_graph, self.lines
-        self.graph = nx.DiGraph(name=self.graph_name)
-        self.lines = dict()
-        node_dict = self.__create_nodes()
-        self.__parse_and_add_edges(node_dict)
-        self.original_graph = copy.deepcopy(self.graph)
+    def reload_graph(self, paths: list = None):
+        """
+        Incrementally reloads the graph. Only files whose mtime or size changed are read again and only files whose hash
+        changed are parsed again. The changes are applied to a copy of the current snapshot that shares all unchanged
+        data with it and which then replaces it. The current view keeps its filters.
+
+        Args:
+            paths (list): Files or directories that changed. If omitted the whole root_dir is scanned.
+
+        Returns:
+            dict: The sets of 'added_nodes', 'removed_nodes' and 'changed_nodes' and the sets of 'added_edges',
+            'changed_edges', whose attributes changed, and 'removed_edges'. Nodes are added only if they were not in
+            the previous graph, so a new file whose page was a dangling link target is a changed node.
+        """
+        with metrics.stage('reload'):
+            snapshot = self.snapshot
+            if paths is None:
+                node_dict = self.__scan_files()
+                removed = [name for name in self.file_stats if name not in node_dict]
+            else:
+                node_dict, removed = self.__scan_paths(paths)
+            added, changed, touched_stats = dict(), dict(), dict()
+            stale = dict()
+            for name, root in node_dict.items():
+                previous = self.file_stats.get(name)
+                try:
+                    stat = os.stat(name)
+                except FileNotFoundError:
+                    continue
+                if not previous or previous[:2] != (stat.st_mtime_ns, stat.st_size):
+                    stale[name] = root
+            for name, stats, text, links, file_tags in ingest(stale, self.workers, self.executor):
+                previous = self.file_stats.get(name)
+                if previous is None:
+                    added[name] = (stats, text, links, file_tags)
+                elif previous[2] != stats[2]:
+                    changed[name] = (stats, text, links, file_tags)
+                else:
+                    self.file_stats[name] = stats
+                    touched_stats[name] = (stats, text, links, file_tags)
+
+            lines, index, tags, search = snapshot.lines, snapshot.index, snapshot.tags, snapshot.search
+            if added or changed or removed:
+                lines, index, tags = lines.copy(), index.copy(), tags.copy()
+                search = search.copy() if search is not None else None
+            added_edges, removed_edges = set(), set()
+            # Attributes of added edges and of edges whose link anchor or description changed.
+            edge_attributes = dict()
+            for name in removed:
+                del self.file_stats[name], lines[name]
+                index.remove(name)
+                tags.remove(name)
+                if search is not None:
+                    search.remove(name)
+                removed_edges.update(snapshot.graph.out_edges(name))
+            for name, (stats, text, links, file_tags) in {**added, **changed}.items():
+                self.file_stats[name] = stats
+                lines[name] = text
+                index.update(name, lines.lower(name))
+                tags.update(name, file_tags)
+                if search is not None:
+                    search.update(name, lines.lower(name))
+                old_targets = set(snapshot.graph.successors(name)) if name in snapshot.graph else set()
+                touched_stats[name] = (stats, text, links, file_tags)
+                new_targets = set(links)
+                added_edges.update((name, target) for target in new_targets - old_targets)
+                removed_edges.update((name, target) for target in old_targets - new_targets)
+                for target, attributes in links.items():
+                    if target not in old_targets or snapshot.graph.get_edge_data(name, target) != attributes:
+                        edge_attributes[(name, target)] = attributes
+
+            # Nodes that are neither files nor linked to by any remaining edge would not exist after a full rebuild.
+            touched = set(removed).union(target for _, target in removed_edges)
+            in_degree = {node: snapshot.graph.in_degree(node) if node in snapshot.graph else 0 for node in touched}
+            for _, target in removed_edges:
+                in_degree[target] -= 1
+            for _, target in added_edges:
+                if target in in_degree:
+                    in_degree[target] += 1
+            removed_nodes = {node for node, degree in in_degree.items() if degree <= 0 and node not in self.file_stats}
+            # New files whose page already existed as a dangling link target are changed nodes, not added ones.
+            added_nodes = {node for node in set(added).union(t for _, t in added_edges)
+                           if node not in snapshot.graph} - removed_nodes
+            promoted = {name for name in added if name in snapshot.graph}
+
+            changed_edges = set(edge_attributes) - added_edges
+            graph = snapshot.graph
+            if isinstance(graph, CSRGraph) and (added or removed or added_edges or removed_edges or changed_edges):
+                graph = graph.patch({name: {'label': self.__node_label(name)} for name in added}, removed_nodes,
+                                    added_edges, removed_edges, {name: ('label',) for name in removed},
+                                    edge_attributes)
+            elif added or removed or added_edges or removed_edges or changed_edges:
+                touched_nodes = set(added).union(removed, *added_edges, *removed_edges, *edge_attributes)
+                for node in removed_nodes:
+                    if node in graph:
+                        touched_nodes.add(node)
+                        touched_nodes.update(graph.successors(node), graph.predecessors(node))
+                graph = self.__copy_graph(graph, touched_nodes, edge_attributes)
+                self.__patch_graph(graph, added, removed_nodes, added_edges, removed_edges, edge_attributes)
+                for name in removed:
+                    if name in graph and name not in removed_nodes:
+                        graph.nodes[name].pop('label', None)
+            if lines is not snapshot.lines:
+                positions = snapshot.positions
+                if self.layout and graph is not snapshot.graph:
+                    changed_links = {node for edge in added_edges | removed_edges for node in edge}
+                    positions = self.__update_layout(graph, positions, changed_links)
+                self.snapshot = GraphSnapshot(self.root_dir, graph, lines, index, snapshot.version + 1, positions, tags,
+                                              search)
+                self.view = self.view.rebase(graph)
+
+            if self.cache:
+                self.cache.put(touched_stats)
+                self.cache.delete(removed)
+            self._stats_digest = None
+
+        changes = {
+            'added_nodes': added_nodes,
+            'removed_nodes': removed_nodes,
+            'changed_nodes': set(changed).union(promoted, (n for n in removed if n not in removed_nodes)),
+            'added_edges': added_edges,
+            'changed_edges': changed_edges,
+            'removed_edges': removed_edges,
+        }
+        info(f"Reloaded {self.root_dir}: {len(added)} added, {len(changed)} changed, {len(removed)} removed files")
+        return changes
 
     def add_attribute_by_regex(self, regexes: list, attribute: list, value: list):
         """
@@ -121,32 +495,33 @@ class VimwikiGraph:
             attribute (list): list of graphviz attribute names
             value (list): list of corresponding values
         """
-        for node in self.graph.nodes:
-            lines = self.lines.get(node, list())
-            if self.__filter_lines_all(regexes, lines):
-                for attr, val in zip(attribute, value):
-                    self.graph.nodes[node][attr] = val
+        for node in self.__filter_documents(regexes, self.view):
+            for attr, val in zip(attribute, value):
+                self.view.set_node_attribute(node, attr, val)
         return self
 
-    def weight_attribute(self, attribute: str = 'fontsize', min_val: int = 20, max_val: int = 100):
+    def weight_attribute(self, attribute: str = 'fontsize', min_val: int = 20, max_val: int = 100,
+                         metric: str = 'betweenness', k: int = None, seed: int = 0):
         """
-        Adds and scales a DOC attribute according to a node's scaled betweenness centrality.
-        It will assign the maximum value to the node with the highest betweenness centrality.
+        Adds and scales a DOC attribute according to a node's scaled centrality.
+        It will assign the maximum value to the node with the highest centrality.
 
         Args:
             attribute: The attribute to add and scale.
             min_val: Minimum value.
             max_val: Maximum value.
+            metric: One of 'betweenness', 'pagerank', 'in_degree', 'out_degree' and 'degree'.
+            k: Number of sampled pivots of an approximate betweenness centrality. Exact if None.
+            seed: Seed of the pivot sampling.
         """
         try:
             exponent = np.log(max_val)/np.log(min_val)
-            centrality = nx.betweenness_centrality(self.graph)
-            max_centrality = max(centrality.values())
+            nodes, values = centrality(self.view, metric, k=k, seed=seed)
+            max_centrality = values.max(initial=0)
             if not max_centrality:
                 return self
-            for key, value in centrality.items():
-                val = max(min((min_val*value/max_centrality)**exponent, max_val), min_val)
-                self.graph.nodes[key][attribute] = val
+            scaled = np.clip((min_val*values/max_centrality)**exponent, min_val, max_val)
+            self.view.set_node_attributes(attribute, dict(zip(nodes, scaled.tolist())))
         except Exception as e:
             print(e)
         finally:
@@ -160,13 +535,14 @@ class VimwikiGraph:
         Args:
             regexes (list)
         """
+        patterns = compile_patterns(regexes)
         nodes_to_remove = list()
-        for node, data in self.graph.nodes(data=True):
-            label = data.get('label')
+        for node in self.view:
+            label = self.view.get_node_attribute(node, 'label')
             debug(f"{node} label: {label} regexes: {regexes}")
-            if label and not self.__filter_lines_all(regexes, [data.get('label')], invert=invert):
+            if label and not self.__filter_text_all(patterns, label.lower(), invert=invert):
                 nodes_to_remove.append(node)
-        self.graph.remove_nodes_from(nodes_to_remove)
+        self.view.remove_nodes_from(nodes_to_remove)
         return self
 
     def filter_nodes(self, regexes: list, invert: bool = False):
@@ -178,30 +554,35 @@ class VimwikiGraph:
             regexes (list)
             invert (bool)
         """
-        nodes_to_remove = list()
-        for node in self.graph.nodes:
-            lines = self.lines.get(node, list())
-            if not self.__filter_lines_all(regexes, lines, invert=invert):
-                nodes_to_remove.append(node)
-        self.graph.remove_nodes_from(nodes_to_remove)
+        matched = self.__filter_documents(regexes, self.view, invert=invert)
+        nodes_to_remove = [node for node in self.view if node not in matched]
+        self.view.remove_nodes_from(nodes_to_remove)
+        return self
+
+    def filter_tags(self, tags: list, invert: bool = False):
+        """
+        Filters nodes by vimwiki tags. All nodes that do not have all of the tags will be removed. If invert then all
+        nodes that have any of the tags will be removed.
+
+        Args:
+            tags (list)
+            invert (bool)
+        """
+        files = [self.tags.files_with(tag) for tag in tags]
+        if invert:
+            matched = set().union(*files)
+            nodes_to_remove = [node for node in self.view if node in matched]
+        else:
+            files.sort(key=len)
+            matched = set(files[0]).intersection(*files[1:]) if files else None
+            nodes_to_remove = [node for node in self.view if matched is not None and node not in matched]
+        self.view.remove_nodes_from(nodes_to_remove)
         return self
 
     def expand_node(self, node: str):
-        if self.graph[node]['is_collapsed']:
-            edges_to_remove = []
-            for neighbor in self.graph.neighbors(node):
-                edges_to_remove.append((node, neighbor))
-            self.graph.remove_edges_from(edges_to_remove)
-
-            edges_to_add = []
-            nodes_to_add = []
-            for neighbor in self.original_graph.neighbors(node):
-                nodes_to_add.append(neighbor)
-                for neighbor2 in self.original_graph.neighbors(neighbor):
-                    edges_to_add.append((neighbor, neighbor2))
-            self.graph.add_nodes_from(nodes_to_add)
-            self.graph.add_edges_from(edges_to_add)
-            self.graph.nodes[node]['is_collapsed'] = False
+        if self.view.get_node_attribute(node, 'is_collapsed'):
+            self.view.expand(node)
+            self.view.set_node_attribute(node, 'is_collapsed', False)
         return self
 
     def collapse_children(self, nodes: list, depth: int = 1):
@@ -212,40 +593,93 @@ class VimwikiGraph:
             node (str): Full or relative path of a vimwiki document.
             depth (int): Number of levels to collapse.
         """
+        roots = list()
         for node in nodes:
             try:
                 node = self.__resolve_relative_path(node)
                 node = self.__add_suffix_to_node(node)
-                self.graph.nodes[node]['is_collapsed'] = True
-                children = nx.dfs_successors(self.graph, node, depth)
-                for child in np.concatenate(list(children.values())):
-                    nx.contracted_nodes(self.graph, node, child, self_loops=False, copy=False)
-                del self.graph.nodes[node]['contraction']
+                if node not in self.view:
+                    raise KeyError(node)
+                roots.append(node)
             except Exception:
                 traceback.print_exc()
+        roots = list(dict.fromkeys(roots))
+        groups = self.__descendants(roots, depth)
+        self.view.set_node_attributes('is_collapsed', dict.fromkeys(roots, True))
+        self.view.contract(groups)
         return self
 
-    def remove_nonadjacent_nodes(self, node: str, depth: int = 1):
+    def neighborhood(self, node: str, depth: int = 1, direction: str = 'both', limit: int = None) -> dict:
+        """
+        Returns the nodes that are linked from or to the specified node up to a certain depth, mapped to their distance
+        in breadth first order.
+
+        Args:
+            node (str): Full or relative path of a vimwiki document.
+            depth (int)
+            direction (str): 'out' follows links, 'in' follows backlinks and 'both' follows both.
+            limit (int): Maximum number of nodes. Closer nodes are kept first.
+        """
+        node = self.__add_suffix_to_node(self.__resolve_relative_path(node))
+        return self.view.neighborhood(node, depth, direction, limit)
+
+    def remove_nonadjacent_nodes(self, node: str, depth: int = 1, direction: str = 'both', limit: int = None):
         """
-        Removes all nodes that are not successors (up to a certain depth) of the specified node in an undirected copy of the graph.
+        Removes all nodes that are not linked from or to the specified node up to a certain depth.
 
         Args:
             node (str)
             depth (int)
+            direction (str): 'out' follows links, 'in' follows backlinks and 'both' follows both.
+            limit (int): Maximum number of nodes to keep. Closer nodes are kept first.
         """
-        node = self.__resolve_relative_path(node)
-        adjacent_nodes = [node]
-        successors = nx.dfs_successors(self.graph.to_undirected(), node, depth)
-        if len(list(successors.values())):
-            adjacent_nodes.extend(np.concatenate(list(successors.values())))
-        adjacent_nodes = np.unique(adjacent_nodes)
-        nodes_to_remove = list()
-        for n in self.graph.nodes:
-            if n not in adjacent_nodes:
-                nodes_to_remove.append(n)
-        self.graph.remove_nodes_from(nodes_to_remove)
-        self.graph.nodes[node]['color'] = 'red'
-        self.graph.nodes[node]['style'] = 'filled'
+        node = self.__add_suffix_to_node(self.__resolve_relative_path(node))
+        adjacent_nodes = self.view.neighborhood(node, depth, direction, limit)
+        nodes_to_remove = [n for n in self.view if n not in adjacent_nodes]
+        self.view.remove_nodes_from(nodes_to_remove)
+        self.view.set_node_attribute(node, 'color', 'red')
+        self.view.set_node_attribute(node, 'style', 'filled')
+        return self
+
+    def search(self, query: str, k: int = 10, boost: float = 0.0, metric: str = 'pagerank') -> tuple:
+        """
+        Returns the documents that best match a full-text query, ranked by BM25. See SearchQuery for the syntax.
+
+        Args:
+            query (str or SearchQuery)
+            k (int): Number of results.
+            boost (float): Weight of the centrality of the documents in the link graph. A document with the highest
+                centrality gets its score multiplied by 1 + boost.
+            metric (str): Centrality metric of the boost, one of 'betweenness', 'pagerank', 'in_degree', 'out_degree'
+                and 'degree'.
+
+        Returns:
+            tuple: The list of (node, score) pairs of the results and the number of matching documents.
+        """
+        index = self.search_index
+        factors = None
+        if boost:
+            nodes, values = centrality(GraphView(self.original_graph), metric)
+            factors = index.boost_vector(nodes, values, boost)
+        return index.search(query, self.lines, k, factors)
+
+    def filter_search(self, query: str, k: int = 10, depth: int = 0, boost: float = 0.0):
+        """
+        Keeps the k best matches of a full-text query and the nodes up to depth links away from them. Matches that are
+        no longer visible are not replaced by worse ones.
+
+        Args:
+            query (str)
+            k (int): Number of matches.
+            depth (int)
+            boost (float): Weight of the pagerank of the matches in their ranking.
+        """
+        results, _ = self.search(query, k, boost)
+        keep = set()
+        for node, _ in results:
+            if node in self.view:
+                keep.update(self.view.neighborhood(node, depth))
+        self.view.remove_nodes_from([node for node in self.view if node not in keep])
         return self
 
     def extend_node_label(self, regexes: list, join_str: str = '\n'):
@@ -256,17 +690,16 @@ class VimwikiGraph:
             regexes (list): list of regexes to match data in the node's corresponding documents
             join_str (str): a string or character used to join any matches
         """
+        patterns = compile_patterns(regexes)
         try:
-            for node in self.graph.nodes:
-                lines = self.lines[node]
+            for node in self.view:
+                text = self.lines.text(node)
                 all_matches = list()
-                for regex in regexes:
-                    for line in lines:
-                        matches = re.findall(regex, line)
-                        all_matches.extend(matches)
-                label = self.graph.nodes[node]['label']
+                for pattern in patterns:
+                    all_matches.extend(pattern.findall(text))
+                label = self.view.node_attributes(node)['label']
                 label = f'"{label}{join_str}{join_str.join(all_matches)}"'
-                self.graph.nodes[node]['label'] = label
+                self.view.set_node_attribute(node, 'label', label)
         except Exception as e:
             print(e)
         finally:
@@ -274,38 +707,23 @@ class VimwikiGraph:
     # }}}
 
     # {{{ Output
-    def write(self, name: str = "", filetype: str = 'png'):
+    def write(self, name: str = "", filetype: str = 'png', engine: str = 'dot'):
         """
-        Writes the current graph to one of name.png or name.dot
+        Writes the current graph to name.filetype. Nodes and edges are streamed to the file, and png, svg and pdf are
+        rendered from DOT by Graphviz.
 
         Args:
             name (str): Name of the resulting file.
-            filetype (str): File type. May be either 'png' or 'dot'.
+            filetype (str): File type. May be 'png', 'svg', 'pdf', 'dot', 'gml', 'graphml', 'json', 'msgpack' or 'html'.
+            engine (str): Graphviz layout engine.
         """
         if not name:
-            name = self.graph.name
-        PG = nx.drawing.nx_pydot.to_pydot(self.graph)
-        PG.set_rankdir('LR')
-        if filetype == 'png':
-            PG.write_png(f"{name}.png")
-        elif filetype == 'dot':
-            PG.write_raw(f"{name}.dot")
-        elif filetype == 'gml':
-            nx.write_gml(self.graph, f"{name}.gml")
-        else:
-            raise Exception("Invalid file type")
+            name = self.graph_name
+        export(self.view, f"{name}.{filetype}", filetype, self.snapshot.positions, engine=engine)
 
     def write_pyviz(self, name: str = ""):
-        if not name:
-            name = self.graph.name
-        nt = Network(
-            height='80vh',
-            width='95vw',
-            neighborhood_highlight=True,
-            filter_menu=True,
-            cdn_resources='remote',
-        )
-        nt.from_nx(self.graph)
-        with open(f'{name}.html', 'w') as f:
-            f.write(nt.generate_html())
+        """
+        Writes the current graph to name.html as a pyvis network.
+        """
+        self.write(name, 'html')
     # }}}
@@ -1,43 +1,78 @@
-from ripgrepy import Ripgrepy
+from collections import Counter
+
+from .shared import SharedDict
 
 
 class VimwikiTags:
+    """
+    Incremental index of the vimwiki tags of the documents. It keeps the tags of every document, the number of
+    occurrences of every tag and the documents of every tag, so a reload only recounts the documents that changed.
+    The tags are extracted by ingest together with the links.
+    """
+
+    def __init__(self):
+        self.documents = dict()
+        self.counts = Counter()
+        # File sets are shared with the index this one was copied from until they change.
+        self.files = SharedDict()
+        self.count_dict = None
+
+    def copy(self) -> 'VimwikiTags':
+        """
+        Returns a copy that shares all file sets with this index until they are changed. Neither index may be changed
+        afterwards except through the copy.
+        """
+        tags = VimwikiTags()
+        tags.documents = dict(self.documents)
+        tags.counts = Counter(self.counts)
+        tags.files = self.files.copy()
+        return tags
+
+    def update(self, name: str, tags: dict):
+        """
+        Indexes or re-indexes the tags of a document.
+
+        Args:
+            name (str): The document.
+            tags (dict): Maps the tags of the document to their number of occurrences, as returned by parse_tags.
+        """
+        self.remove(name)
+        if not tags:
+            return
+        self.documents[name] = tags
+        self.counts.update(tags)
+        for tag in tags:
+            self.files.writable(tag, set).add(name)
+        self.count_dict = None
+
+    def remove(self, name: str):
+        tags = self.documents.pop(name, None)
+        if not tags:
+            return
+        self.counts.subtract(tags)
+        for tag in tags:
+            files = self.files.writable(tag, set)
+            files.discard(name)
+            if not files:
+                del self.files[tag], self.counts[tag]
+        self.count_dict = None
 
-    def __init__(self, root_dir, search_pattern=r'^:((\w+:)+)'):
-        self.root_dir = root_dir
-        self.search_pattern = search_pattern
-        self.search_result = []
-        self.count_dict = {}
-
-    def _search(self):
-        rg = Ripgrepy(self.search_pattern, self.root_dir)
-        matches = rg.no_filename().only_matching().run().as_string
-        matches = matches.split(':')
-        self.search_result = [m for m in matches if m != '' and m != '\n']
-
-    def _generate_counts_dict(self):
-        counts = dict()
-        for m in self.search_result:
-            if m not in counts:
-                counts[m] = 1
-            else:
-                counts[m] += 1
-        self.count_dict = dict(sorted(counts.items(), key=lambda item: item[1], reverse=True))
+    def files_with(self, tag: str) -> set:
+        """
+        Returns the set of documents that have tag. The set must not be changed.
+        """
+        return self.files.get(tag, set())
 
     def _format_dict(self):
         counts_list = list()
-        for k, v in self.count_dict.items():
+        for k, v in self.populate_tags().items():
             counts_list.append("* {:<3} {}".format(str(v), k))
         return counts_list
 
     def populate_tags(self) -> dict:
-        if not self.search_result:
-            self._search()
-        if not self.count_dict:
-            self._generate_counts_dict()
-        return self.count_dict # type: ignore
-
-    def reload(self):
-        del self.search_result, self.count_dict
-        self.search_result = []
-        self.count_dict = {}
+        """
+        Returns the number of occurrences of every tag, sorted by decreasing count.
+        """
+        if self.count_dict is None:
+            self.count_dict = dict(sorted(self.counts.items(), key=lambda item: item[1], reverse=True))
+        return self.count_dict
@@ -0,0 +1,128 @@
+import os
+import threading
+import time
+import traceback
+from logging import debug, info
+
+try:
+    from inotify_simple import INotify, flags
+except ImportError:
+    INotify = None
+
+
+class VimwikiWatcher(threading.Thread):
+    """
+    Watches a wiki directory in a background thread and passes batches of changed paths to a callback. Uses inotify if
+    inotify_simple is installed and falls back to polling file stats otherwise. Changes that arrive within 'debounce'
+    seconds of each other are grouped into a single batch, but no batch is held back for longer than 'max_delay'.
+    """
+
+    def __init__(self, root_dir: str, callback, file_extensions: list = ['wiki'], interval: float = 2.0,
+                 debounce: float = 0.5, max_delay: float = 5.0, use_inotify: bool = True):
+        super().__init__(name='vimwikiwatcher', daemon=True)
+        self.root_dir = root_dir
+        self.callback = callback
+        self.file_extensions = file_extensions
+        self.interval = interval
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.use_inotify = use_inotify and INotify is not None
+        self._stop_event = threading.Event()
+        self._pending = set()
+        self._first_pending = None
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        info(f"Watching {self.root_dir} with {'inotify' if self.use_inotify else 'polling'}")
+        if self.use_inotify:
+            self.__run_inotify()
+        else:
+            self.__run_polling()
+
+    # {{{ Batching
+    def __add_pending(self, paths):
+        if paths and not self._pending:
+            self._first_pending = time.monotonic()
+        self._pending.update(paths)
+
+    def __flush(self, quiet: bool):
+        """
+        Passes the pending paths to the callback if no new changes arrived ('quiet') or the oldest change is overdue.
+        """
+        if not self._pending:
+            return
+        if not quiet and time.monotonic() - self._first_pending < self.max_delay:
+            return
+        paths, self._pending = sorted(self._pending), set()
+        debug(f"Watcher batch: {paths}")
+        try:
+            self.callback(paths)
+        except Exception:
+            traceback.print_exc()
+    # }}}
+
+    # {{{ Polling
+    def __stat_files(self):
+        stats = dict()
+        for root, dir, files in os.walk(self.root_dir):
+            for file in files:
+                if file.split('.')[-1] in self.file_extensions:
+                    name = os.path.join(root, file)
+                    try:
+                        stat = os.stat(name)
+                    except FileNotFoundError:
+                        continue
+                    stats[name] = (stat.st_mtime_ns, stat.st_size)
+        return stats
+
+    def __run_polling(self):
+        stats = self.__stat_files()
+        while not self._stop_event.wait(self.debounce if self._pending else self.interval):
+            new_stats = self.__stat_files()
+            paths = {name for name, stat in new_stats.items() if stats.get(name) != stat}
+            paths.update(name for name in stats if name not in new_stats)
+            stats = new_stats
+            self.__add_pending(paths)
+            self.__flush(quiet=not paths)
+    # }}}
+
+    # {{{ inotify
+    def __add_watches(self, inotify, watches, path):
+        mask = (flags.CREATE | flags.MODIFY | flags.CLOSE_WRITE | flags.DELETE | flags.MOVED_FROM | flags.MOVED_TO
+                | flags.DELETE_SELF)
+        for root, dir, files in os.walk(path):
+            try:
+                watches[inotify.add_watch(root, mask)] = root
+            except OSError:
+                traceback.print_exc()
+
+    def __run_inotify(self):
+        inotify = INotify()
+        watches = dict()
+        self.__add_watches(inotify, watches, self.root_dir)
+        try:
+            while not self._stop_event.is_set():
+                timeout = self.debounce if self._pending else self.interval
+                events = inotify.read(timeout=int(timeout * 1000))
+                paths = set()
+                for event in events:
+                    root = watches.get(event.wd)
+                    if root is None:
+                        continue
+                    if event.mask & flags.IGNORED:
+                        del watches[event.wd]
+                        continue
+                    path = os.path.join(root, event.name) if event.name else root
+                    if event.mask & flags.ISDIR:
+                        if event.mask & (flags.CREATE | flags.MOVED_TO):
+                            self.__add_watches(inotify, watches, path)
+                        paths.add(path)
+                    elif event.name.split('.')[-1] in self.file_extensions:
+                        paths.add(path)
+                self.__add_pending(paths)
+                self.__flush(quiet=not events)
+        finally:
+            inotify.close()
+    # }}}